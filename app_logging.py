@@ -0,0 +1,129 @@
+import os
+import copy
+import json
+import queue
+import logging
+import logging.handlers
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+DEFAULT_LOG_DIR = os.path.join(os.path.expanduser("~"), ".cache", "listen-write-translate", "logs")
+# Records on this logger (and warnings from anywhere) are shown in the status area
+STATUS_LOGGER = "status"
+# Chatty at DEBUG (every request and connection); only their warnings are kept
+QUIET_LOGGERS = ("httpx", "httpcore", "urllib3", "groq")
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any `extra` fields passed to the logger"""
+    STANDARD = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+    def format(self, record):
+        entry = {
+            "time": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in self.STANDARD:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RecordQueueHandler(logging.handlers.QueueHandler):
+    """Queues records with exc_info intact so each handler formats tracebacks its own way.
+
+    The stock prepare() folds the traceback into the message, which put it
+    inside the JSON "message" and on the status line.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+
+class StatusFormatter(logging.Formatter):
+    """One line per record; an exception is summarised rather than printed as a traceback"""
+
+    def format(self, record):
+        record.message = record.getMessage()
+        record.asctime = self.formatTime(record, self.datefmt)
+        text = self.formatMessage(record)
+        if record.exc_info and record.exc_info[1] is not None:
+            error = record.exc_info[1]
+            text += f" ({type(error).__name__}: {error})"
+        return text
+
+
+class StatusFilter(logging.Filter):
+    def filter(self, record):
+        return record.name == STATUS_LOGGER or record.levelno >= logging.WARNING
+
+
+class StatusEmitter(QObject):
+    message = pyqtSignal(str)
+
+
+class StatusLogHandler(logging.Handler):
+    """Forwards status records to the UI thread through a queued signal"""
+
+    def __init__(self):
+        super().__init__(logging.INFO)
+        self.emitter = StatusEmitter()
+        self.message = self.emitter.message
+        self.addFilter(StatusFilter())
+        self.setFormatter(StatusFormatter("%(asctime)s %(message)s", "%H:%M:%S"))
+
+    def emit(self, record):
+        try:
+            self.message.emit(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+
+def setup_logging(status_handler=None, log_dir=None):
+    """Route all logging through a queue to a rotating JSONL file, the console and the UI.
+
+    Worker threads only put records on an unbounded queue; formatting and
+    file I/O happen on the QueueListener's thread. LOG_LEVEL sets the
+    console level, LOG_FILE_LEVEL the file level; HTTP client libraries
+    only log warnings. Returns the started listener; call stop() on it at
+    exit to flush.
+    """
+    log_dir = log_dir or os.getenv("LOG_DIR", DEFAULT_LOG_DIR)
+    os.makedirs(log_dir, exist_ok=True)
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        os.path.join(log_dir, "transcriber.jsonl"), encoding="utf-8",
+        maxBytes=int(float(os.getenv("LOG_MAX_MB", "5")) * 1024 * 1024),
+        backupCount=int(os.getenv("LOG_BACKUPS", "3")))
+    file_handler.setLevel(os.getenv("LOG_FILE_LEVEL", "DEBUG").upper())
+    file_handler.setFormatter(JsonFormatter())
+
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    console_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    handlers = [file_handler, console_handler]
+    if status_handler is not None:
+        handlers.append(status_handler)
+
+    log_queue = queue.Queue(-1)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(RecordQueueHandler(log_queue))
+    root.setLevel(min(handler.level for handler in handlers))
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -0,0 +1,387 @@
+import time
+import asyncio
+import logging
+import threading
+
+import requests
+from PyQt6.QtCore import QObject, pyqtSignal
+
+import metrics
+from audio_preprocess import coalesce_wavs
+from segment_queue import SegmentQueue
+
+try:
+    import httpx
+except ImportError:  # Uploads fall back to requests in a thread
+    httpx = None
+
+log = logging.getLogger(__name__)
+
+
+class AsyncPipeline(QObject, SegmentQueue):
+    """Transcription, translation and upload as asyncio stages on one event loop.
+
+    A drop-in for TranscriptionWorker: it has the same slots and signals and
+    also translates and uploads, emitting translation_ready. The loop runs
+    in its own thread and Qt signals carry results back to the UI.
+
+    Each stage reads a bounded queue and keeps up to its concurrency limit
+    of requests in flight. A stage that can't hand a result to the next,
+    full queue stops taking work, so slowness propagates upstream instead of
+    piling up in memory. Segments that arrive while the transcription queue
+    is full go to the offline spool rather than blocking the caller.
+    Transcripts are emitted in segment order even when requests finish out
+    of order. stop() returns at once and cancels every in-flight request,
+    spooling the segments and texts it interrupted; queued items wait for
+    the next start.
+    """
+    text_ready = pyqtSignal(object)  # Utterance with its text
+    partial_text_ready = pyqtSignal(str)
+    translation_ready = pyqtSignal(object)  # Utterance with its translation
+    error = pyqtSignal(str)
+
+    def __init__(self, backend, translator, upload_url=None, target_lang="ZH",
+                 queue_size=8, concurrency=4):
+        super().__init__()
+        self.backend = backend
+        self.translator = translator
+        self.upload_url = upload_url
+        self.target_lang = target_lang
+        self.queue_size = queue_size
+        self.concurrency = concurrency  # Requests in flight per stage
+        self.init_segment_queue()
+        self.PARTIAL_MIN_INTERVAL = 1.0  # seconds between interim requests
+        self.TRANSLATE_ATTEMPTS = 2
+        self.TRANSLATE_RETRY_DELAY = 0.2  # seconds
+        self.UPLOAD_TIMEOUT = 10  # seconds
+        # Everything below is only touched on the loop thread
+        self.pending_partial = None
+        self.partial_generation = 0
+        self.last_partial_time = 0
+        self.jobs = set()
+        self.main_task = None
+        self.runs = set()  # Runs still winding down after a stop
+        self.http = None
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.call(self.setup())
+
+    def call(self, coroutine, timeout=None):
+        """Run a coroutine on the loop from another thread and wait for it"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
+    async def setup(self):
+        self.transcribe_queue = asyncio.Queue(self.queue_size)
+        self.translate_queue = asyncio.Queue(self.queue_size)
+        self.upload_queue = asyncio.Queue(self.queue_size)
+        self.partial_event = asyncio.Event()
+        if httpx is not None:
+            self.http = httpx.AsyncClient(timeout=self.UPLOAD_TIMEOUT)
+
+    # Slots, called from the Qt main thread
+
+    def process_audio(self, utterance):
+        log.debug("Queuing utterance %s for transcription", utterance.seq)
+        self.loop.call_soon_threadsafe(self.enqueue, None, utterance)
+
+    def process_speculative(self, segment_id, utterance):
+        log.debug("Queuing speculative segment %d", segment_id)
+        self.loop.call_soon_threadsafe(self.enqueue_speculative, segment_id, utterance)
+
+    def confirm_speculative(self, segment_id):
+        self.loop.call_soon_threadsafe(self.confirm, segment_id)
+
+    def cancel_speculative(self, segment_id):
+        self.loop.call_soon_threadsafe(self.cancel, segment_id)
+
+    def process_partial(self, wav_bytes):
+        self.loop.call_soon_threadsafe(self.set_partial, wav_bytes)
+
+    def process_text(self, utterance):
+        """Translate and upload an utterance transcribed elsewhere (spool replay)"""
+        asyncio.run_coroutine_threadsafe(self.translate_queue.put(utterance), self.loop)
+
+    def process_translation(self, utterance):
+        """Publish and upload an utterance translated elsewhere (spool replay)"""
+        asyncio.run_coroutine_threadsafe(self.publish(utterance), self.loop)
+
+    def start_processing(self):
+        log.debug("Starting async pipeline...")
+        self.loop.call_soon_threadsafe(self.start_stages)
+
+    def stop(self):
+        log.debug("Stopping async pipeline...")
+        self.loop.call_soon_threadsafe(self.stop_stages)
+
+    def close(self):
+        self.call(self.shutdown())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    # Loop thread
+
+    def enqueue(self, segment_id, utterance):
+        # A closed segment makes any interim snapshot of it obsolete
+        self.partial_generation += 1
+        self.pending_partial = None
+        try:
+            self.transcribe_queue.put_nowait((segment_id, utterance))
+        except asyncio.QueueFull:
+            log.warning("Transcription queue full, segment %s spooled", utterance.seq)
+            self.segment_failed(segment_id, utterance)
+
+    def enqueue_speculative(self, segment_id, utterance):
+        self.add_speculative(segment_id)
+        self.enqueue(segment_id, utterance)
+
+    def confirm(self, segment_id):
+        utterance = self.take_confirmed(segment_id)
+        if utterance is not None:
+            self.spawn(self.emit_text(utterance))
+
+    def cancel(self, segment_id):
+        state = self.drop_speculative(segment_id)
+        # A request for this segment alone is aborted; a merged one finishes for the others
+        if state is not None and state["task"] is not None:
+            state["task"].cancel()
+
+    def set_partial(self, wav_bytes):
+        self.pending_partial = (self.partial_generation, wav_bytes)
+        self.partial_event.set()
+
+    def spawn(self, coroutine, limit=None, label="Pipeline"):
+        """Run a coroutine as a task owned by the current run; stop() cancels it"""
+        task = self.loop.create_task(coroutine)
+        jobs = self.jobs
+        jobs.add(task)
+
+        def done(task):
+            jobs.discard(task)
+            if limit is not None:
+                limit.release()
+            if not task.cancelled() and task.exception() is not None:
+                log.debug("%s error", label, exc_info=task.exception())
+                self.error.emit(f"{label} Error: {str(task.exception())}")
+        task.add_done_callback(done)
+        return task
+
+    def start_stages(self):
+        if self.main_task is None:
+            self.main_task = self.loop.create_task(self.run())
+            self.runs.add(self.main_task)
+            self.main_task.add_done_callback(self.runs.discard)
+
+    def stop_stages(self):
+        # A new run may start while this one is still cancelling its requests
+        if self.main_task is not None:
+            self.main_task.cancel()
+            self.main_task = None
+
+    async def shutdown(self):
+        self.stop_stages()
+        await asyncio.gather(*self.runs, return_exceptions=True)
+        # Jobs spawned after their run ended, such as a confirm that arrived while stopped
+        for task in list(self.jobs):
+            task.cancel()
+        await asyncio.gather(*self.jobs, return_exceptions=True)
+        self.spool_queued()
+        await self.backend.aclose()
+        await self.translator.aclose()
+        if self.http is not None:
+            await self.http.aclose()
+
+    def spool_queued(self):
+        """Keep everything still queued on disk; the loop is about to end"""
+        super().spool_queued()
+        # Texts waiting for translation or upload are translated again on replay
+        for queue in (self.translate_queue, self.upload_queue):
+            while not queue.empty():
+                self.spool_text(queue.get_nowait())
+
+    async def run(self):
+        log.info("Async pipeline started")
+        jobs = self.jobs = set()
+        self.emitted = self.loop.create_future()
+        self.emitted.set_result(None)
+        try:
+            await asyncio.gather(
+                self.transcribe_stage(),
+                self.partial_stage(),
+                self.stage(self.translate_queue, self.translate, "Translation"),
+                self.stage(self.upload_queue, self.upload, "Upload"),
+            )
+        finally:
+            for task in list(jobs):
+                task.cancel()
+            await asyncio.gather(*jobs, return_exceptions=True)
+            log.info("Async pipeline stopped")
+
+    async def stage(self, queue, handler, label):
+        limit = asyncio.Semaphore(self.concurrency)
+        while True:
+            # Take a slot first so nothing is held outside the queue while waiting
+            await limit.acquire()
+            item = await queue.get()
+            self.spawn(handler(item), limit, label)
+
+    # Transcription
+
+    async def next_item(self):
+        if self.held_item is not None:
+            item, self.held_item = self.held_item, None
+            return item
+        return await self.transcribe_queue.get()
+
+    async def transcribe_stage(self):
+        limit = asyncio.Semaphore(self.concurrency)
+        while True:
+            await limit.acquire()
+            item = await self.next_item()
+            if self.is_cancelled(item):
+                log.debug("Skipping cancelled speculative segment %d", item[0])
+                limit.release()
+                continue
+            batch = self.collect_batch(item)
+            # Each job emits only after the one dispatched before it
+            previous, self.emitted = self.emitted, self.loop.create_future()
+            task = self.spawn(self.transcribe(batch, previous, self.emitted), limit, "Transcription")
+            if len(batch) == 1 and item[0] is not None:
+                self.speculative[item[0]]["task"] = task
+
+    async def transcribe(self, batch, previous, emitted):
+        transcribed = False
+        delivered = 0
+        try:
+            try:
+                if len(batch) == 1:
+                    utterance = batch[0][1]
+                    log.debug("Processing utterance %s", utterance.seq)
+                    with metrics.timed("transcribe"):
+                        transcription = await self.uncached_if_speculative(batch).atranscribe(utterance.audio)
+                    utterance.set_text(transcription["text"], transcription["segments"])
+                else:
+                    await self.transcribe_coalesced(batch)
+                transcribed = True
+                await asyncio.shield(previous)
+                for segment_id, utterance in batch:
+                    # From here on emit_text spools the text itself if stopped
+                    delivered += 1
+                    if segment_id is not None:
+                        await self.deliver_speculative(segment_id, utterance)
+                    else:
+                        await self.emit_text(utterance)
+            except asyncio.CancelledError:
+                # Stopped rather than superseded: keep what wasn't delivered for the spool
+                for item in batch[delivered:]:
+                    if self.is_cancelled(item):
+                        continue
+                    if transcribed:
+                        self.text_failed(*item)
+                    else:
+                        self.segment_failed(*item)
+                raise
+            except Exception:
+                for item in batch[delivered:]:
+                    self.segment_failed(*item)
+                raise
+        finally:
+            if not emitted.done():
+                emitted.set_result(None)
+
+    async def transcribe_coalesced(self, batch):
+        log.debug("Coalescing %d short segments into one request", len(batch))
+        merged, offsets = coalesce_wavs([utterance.audio for _, utterance in batch], self.COALESCE_GAP)
+        with metrics.timed("transcribe"):
+            transcription = await self.uncached_if_speculative(batch).atranscribe(merged)
+        self.split_coalesced(batch, offsets, transcription)
+
+    async def deliver_speculative(self, segment_id, utterance):
+        if self.speculative_result(segment_id, utterance):
+            await self.emit_text(utterance)
+
+    async def emit_text(self, utterance):
+        if utterance.text.strip():
+            log.debug("Emitting transcription: %s", utterance.text)
+            # Queue first so a stop while the queue is full spools the text instead of losing it
+            try:
+                await self.translate_queue.put(utterance)
+            except asyncio.CancelledError:
+                self.spool_text(utterance)
+                raise
+            self.text_ready.emit(utterance)
+
+    async def partial_stage(self):
+        while True:
+            await self.partial_event.wait()
+            self.partial_event.clear()
+            wait = self.PARTIAL_MIN_INTERVAL - (time.monotonic() - self.last_partial_time)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            # Final segments go first; a newer snapshot will follow
+            if self.pending_partial is None or not self.transcribe_queue.empty():
+                continue
+            generation, wav_bytes = self.pending_partial
+            self.pending_partial = None
+            self.last_partial_time = time.monotonic()
+            try:
+                with metrics.timed("partial"):
+                    transcription = await self.backend.uncached().atranscribe(wav_bytes)
+            except Exception as e:
+                log.debug("Interim transcription error", exc_info=True)
+                self.error.emit(f"Transcription Error: {str(e)}")
+                continue
+            # Drop the result if the segment closed while the request was in flight
+            if generation == self.partial_generation and transcription["text"].strip():
+                self.partial_text_ready.emit(transcription["text"])
+
+    # Translation and upload
+
+    async def translate(self, utterance):
+        for attempt in range(self.TRANSLATE_ATTEMPTS):
+            try:
+                with metrics.timed("translate"):
+                    utterance.translation = await self.translator.atranslate(utterance.text, self.target_lang)
+            except asyncio.CancelledError:
+                self.spool_text(utterance)
+                raise
+            except Exception as e:
+                if attempt < self.TRANSLATE_ATTEMPTS - 1:
+                    self.error.emit(f"Translation Error: {str(e)}, retrying...")
+                    await asyncio.sleep(self.TRANSLATE_RETRY_DELAY)
+                    continue
+                self.spool_text(utterance)
+                self.error.emit(f"Translation Error: {str(e)}, spooled for retry")
+                return
+            utterance.mark("translated")
+            await self.publish(utterance)
+            return
+
+    async def publish(self, utterance):
+        self.translation_ready.emit(utterance)
+        if self.upload_url:
+            await self.upload_queue.put(utterance)
+
+    async def upload(self, utterance):
+        payload = {
+            "original_text": utterance.text,
+            "translated_text": utterance.translation
+        }
+        try:
+            with metrics.timed("upload"):
+                if self.http is not None:
+                    response = await self.http.post(self.upload_url, json=payload)
+                else:
+                    response = await asyncio.to_thread(requests.post, self.upload_url, json=payload,
+                                                      timeout=self.UPLOAD_TIMEOUT)
+        except Exception as e:
+            metrics.api_error("records", e)
+            raise
+        body = response.request.content if self.http is not None else response.request.body
+        metrics.bytes_uploaded.inc("records", amount=len(body or b""))
+        if response.status_code != 200:
+            metrics.api_error("records", response.status_code)
+            self.error.emit(f"Upload Error: {response.status_code}")
+        else:
+            utterance.mark("uploaded")
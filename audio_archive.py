@@ -0,0 +1,243 @@
+import os
+import sys
+import mmap
+import time
+import queue
+import logging
+import argparse
+import threading
+
+import numpy as np
+
+from wav_io import encode_pcm16, to_mono_16k
+from offline_spool import compress_wav, decompress_wav
+
+DEFAULT_ARCHIVE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "listen-write-translate", "archive")
+ARCHIVE_RATE = 16000
+# One fixed-size index entry per utterance: capture start/end, position and size in the data file, codec
+INDEX_DTYPE = np.dtype([("start", "<f8"), ("end", "<f8"), ("offset", "<u8"), ("length", "<u4"), ("codec", "<u4")])
+CODECS = [".wav.z", ".flac"]
+
+log = logging.getLogger(__name__)
+
+
+class AudioArchiveWriter:
+    """Append-only archive of one session's utterance audio.
+
+    `<session>.audio` holds independently compressed 16 kHz mono records
+    (FLAC with soundfile, zlib WAV otherwise) and `<session>.idx` one
+    INDEX_DTYPE entry per record. The index entry is written after its data,
+    so a crash leaves at worst an unindexed tail. Compression and disk writes
+    run on a background thread.
+    """
+
+    def __init__(self, session_id, directory=None):
+        self.directory = directory or os.getenv("ARCHIVE_DIR", DEFAULT_ARCHIVE_DIR)
+        os.makedirs(self.directory, exist_ok=True)
+        self.session_id = session_id
+        self.prefix = os.path.join(self.directory, session_id)
+        self.records = queue.Queue()
+        self.thread = None
+
+    def start(self):
+        """Prune old sessions, then start writing this one"""
+        try:
+            prune(self.directory, keep=self.session_id)
+        except OSError as e:
+            log.warning("Archive pruning failed: %s", e)
+        self.thread = threading.Thread(target=self.write_loop, daemon=True)
+        self.thread.start()
+
+    def append(self, audio, rate, capture_start):
+        """Queue float audio shaped (frames,) or (frames, channels) captured at capture_start"""
+        self.records.put((audio, rate, capture_start))
+
+    def append_pcm(self, pcm, capture_start):
+        """Queue audio already converted to ARCHIVE_RATE mono int16"""
+        self.records.put((pcm, None, capture_start))
+
+    def write_loop(self):
+        with open(self.prefix + ".audio", "ab") as data_file, open(self.prefix + ".idx", "ab") as index_file:
+            while True:
+                record = self.records.get()
+                if record is None:
+                    return
+                try:
+                    self.write(data_file, index_file, *record)
+                except Exception as e:
+                    log.exception("Archive write failed: %s", e)
+
+    def write(self, data_file, index_file, audio, rate, capture_start):
+        if rate is None:
+            pcm = audio
+        else:
+            pcm = to_mono_16k((np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16), rate)
+        data, extension = compress_wav(encode_pcm16(pcm, ARCHIVE_RATE))
+        offset = data_file.seek(0, os.SEEK_END)
+        data_file.write(data)
+        data_file.flush()
+        entry = np.array([(capture_start, capture_start + len(pcm) / ARCHIVE_RATE, offset, len(data),
+                           CODECS.index(extension))], dtype=INDEX_DTYPE)
+        index_file.write(entry.tobytes())
+        index_file.flush()
+
+    def close(self):
+        if self.thread is not None:
+            self.records.put(None)
+            self.thread.join()
+            self.thread = None
+
+
+class AudioArchiveReader:
+    """Random access to an archived session through a memory-mapped index.
+
+    Looking up an utterance only touches its index entry and its own
+    compressed record; nothing else in the data file is read.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.index_file = open(prefix + ".idx", "rb")
+        size = os.fstat(self.index_file.fileno()).st_size
+        count = size // INDEX_DTYPE.itemsize  # Ignore a partly written last entry
+        if count:
+            self.index_map = mmap.mmap(self.index_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.index = np.frombuffer(self.index_map, dtype=INDEX_DTYPE, count=count)
+        else:
+            self.index_map = None
+            self.index = np.zeros(0, dtype=INDEX_DTYPE)
+        self.data_file = open(prefix + ".audio", "rb")
+
+    def __len__(self):
+        return len(self.index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def find(self, start, end=None):
+        """Indexes of utterances overlapping [start, end] (or containing start)"""
+        end = start if end is None else end
+        # Entries are appended in capture order, so both columns are sorted
+        first = int(np.searchsorted(self.index["end"], start, side="left"))
+        last = int(np.searchsorted(self.index["start"], end, side="right"))
+        return list(range(first, last))
+
+    def entry(self, i):
+        start, end, offset, length, codec = self.index[i].tolist()
+        return {"start": start, "end": end, "offset": offset, "length": length, "codec": CODECS[codec]}
+
+    def read(self, i):
+        """WAV bytes of utterance i"""
+        entry = self.entry(i)
+        self.data_file.seek(entry["offset"])
+        return decompress_wav(self.data_file.read(entry["length"]), entry["codec"])
+
+    def close(self):
+        self.index = None
+        if self.index_map is not None:
+            try:
+                self.index_map.close()
+            except BufferError:
+                pass  # A caller still holds a view of the index; released with it
+        self.index_file.close()
+        self.data_file.close()
+
+
+def sessions(directory=None):
+    directory = directory or os.getenv("ARCHIVE_DIR", DEFAULT_ARCHIVE_DIR)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name[:-4] for name in os.listdir(directory) if name.endswith(".idx"))
+
+
+def prune(directory=None, max_bytes=None, max_days=None, keep=None):
+    """Delete whole sessions, oldest first, that are older than max_days or exceed max_bytes in total.
+
+    Defaults come from ARCHIVE_MAX_GB (2) and ARCHIVE_DAYS (30); 0 turns a
+    limit off. The session `keep` is never deleted. Returns the sessions removed.
+    """
+    directory = directory or os.getenv("ARCHIVE_DIR", DEFAULT_ARCHIVE_DIR)
+    if max_bytes is None:
+        max_bytes = float(os.getenv("ARCHIVE_MAX_GB", "2")) * 1024 ** 3
+    if max_days is None:
+        max_days = float(os.getenv("ARCHIVE_DAYS", "30"))
+    found = []
+    for name in sessions(directory):
+        if name == keep:
+            continue
+        paths = [os.path.join(directory, name + suffix) for suffix in (".idx", ".audio")]
+        size = sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+        found.append((os.path.getmtime(paths[0]), name, size, paths))
+    found.sort()  # Oldest first
+    total = sum(size for _, _, size, _ in found)
+    cutoff = time.time() - max_days * 86400
+    removed = []
+    for modified, name, size, paths in found:
+        if not (max_days and modified < cutoff) and not (max_bytes and total > max_bytes):
+            break
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+        total -= size
+        removed.append(name)
+    if removed:
+        log.info("Archive pruned %d old sessions", len(removed))
+    return removed
+
+
+def stamp(t):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t))
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from transcription_backends import create_backend
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="List, extract, re-transcribe or prune archived session audio")
+    parser.add_argument("command", choices=["list", "extract", "transcribe", "prune"])
+    parser.add_argument("session", nargs="?")
+    parser.add_argument("--at", type=float, help="capture time (Unix seconds) of the utterance")
+    parser.add_argument("-o", "--output", default=".", help="directory for extracted WAV files")
+    parser.add_argument("--backend", choices=["groq", "local"], default=None)
+    parser.add_argument("--dir", default=None)
+    args = parser.parse_args()
+    directory = args.dir or os.getenv("ARCHIVE_DIR", DEFAULT_ARCHIVE_DIR)
+
+    if args.command == "prune":
+        for name in prune(directory):
+            print(name)
+        sys.exit(0)
+    if args.command == "list" and not args.session:
+        for name in sessions(directory):
+            with AudioArchiveReader(os.path.join(directory, name)) as reader:
+                span = f"{stamp(reader.index['start'][0])} - {stamp(reader.index['end'][-1])}" if len(reader) else ""
+                print(f"{name}: {len(reader)} utterances {span}")
+        sys.exit(0)
+    if not args.session:
+        parser.error("a session is required")
+
+    with AudioArchiveReader(os.path.join(directory, args.session)) as reader:
+        selected = reader.find(args.at) if args.at is not None else range(len(reader))
+        if args.command == "list":
+            for i in selected:
+                entry = reader.entry(i)
+                print(f"{i:5d} {stamp(entry['start'])} {entry['end'] - entry['start']:6.1f}s {entry['codec']}")
+        elif args.command == "extract":
+            os.makedirs(args.output, exist_ok=True)
+            for i in selected:
+                path = os.path.join(args.output, f"{args.session}-{i:05d}.wav")
+                with open(path, "wb") as file:
+                    file.write(reader.read(i))
+                print(path)
+        else:
+            backend = create_backend(args.backend, cache=False)
+            try:
+                for i in selected:
+                    text = backend.transcribe(reader.read(i))["text"].strip()
+                    print(f"[{stamp(reader.entry(i)['start'])}] {text}")
+            finally:
+                backend.close()
@@ -0,0 +1,209 @@
+import io
+import wave
+from bisect import bisect_right
+
+import numpy as np
+
+
+class TimeMap:
+    """Map timestamps in processed audio back to capture time.
+
+    spans is a list of (out_start, in_start, out_duration, scale) tuples in
+    seconds: processed time out_start + d corresponds to input time
+    in_start + d * scale. Input time is then passed through `base` (an
+    earlier processing stage) or offset by `origin`, the capture time of the
+    first input sample.
+    """
+
+    def __init__(self, spans, origin=0.0, base=None):
+        self.spans = spans
+        self.starts = [span[0] for span in spans]
+        self.origin = origin
+        self.base = base
+
+    @classmethod
+    def identity(cls, duration, origin=0.0):
+        return cls([(0.0, 0.0, duration, 1.0)], origin=origin)
+
+    @property
+    def duration(self):
+        if not self.spans:
+            return 0.0
+        out_start, _, out_duration, _ = self.spans[-1]
+        return out_start + out_duration
+
+    def to_capture(self, t):
+        if not self.spans:
+            position = t
+        else:
+            index = max(0, bisect_right(self.starts, t) - 1)
+            out_start, in_start, out_duration, scale = self.spans[index]
+            offset = min(max(t - out_start, 0.0), out_duration)
+            position = in_start + offset * scale
+        if self.base is not None:
+            return self.base.to_capture(position)
+        return self.origin + position
+
+    def map_segments(self, segments):
+        """Copy of verbose_json segments with capture_start / capture_end added"""
+        mapped = []
+        for segment in segments:
+            segment = dict(segment)
+            segment["capture_start"] = self.to_capture(segment["start"])
+            segment["capture_end"] = self.to_capture(segment["end"])
+            mapped.append(segment)
+        return mapped
+
+
+def block_rms(audio, block_frames):
+    """RMS of each block of a (frames,) or (frames, channels) float array"""
+    n_blocks = len(audio) // block_frames
+    usable = audio[:n_blocks * block_frames]
+    if usable.ndim > 1:
+        usable = usable.reshape(n_blocks, block_frames * usable.shape[1])
+    else:
+        usable = usable.reshape(n_blocks, block_frames)
+    return np.sqrt(np.mean(np.square(usable, dtype=np.float32), axis=1))
+
+
+def trim_and_compress(audio, rate, threshold=0.01, block_seconds=0.02,
+                      max_pause=0.5, keep_pause=0.2, edge_pad=0.1, origin=0.0):
+    """Trim silence at the edges and shorten long internal pauses.
+
+    Pauses longer than max_pause are cut down to keep_pause (half kept on
+    each side), and edge_pad seconds are left around the first and last
+    voiced block. Returns the processed audio and a TimeMap back to capture
+    time (origin is the capture time of the first input sample).
+    """
+    block_frames = max(1, int(rate * block_seconds))
+    voiced = block_rms(audio, block_frames) > threshold
+    if not voiced.any():
+        return audio[:0], TimeMap([], origin=origin)
+
+    voiced_blocks = np.flatnonzero(voiced)
+    pad = int(edge_pad * rate)
+    first = max(0, voiced_blocks[0] * block_frames - pad)
+    last = min(len(audio), (voiced_blocks[-1] + 1) * block_frames + pad)
+
+    # Input frame ranges to keep, split around pauses that are too long
+    keep_half = int(keep_pause * rate / 2)
+    kept = []
+    span_start = first
+    gaps = np.diff(voiced_blocks) - 1
+    for index in np.flatnonzero(gaps * block_seconds > max_pause):
+        pause_start = (voiced_blocks[index] + 1) * block_frames
+        pause_end = voiced_blocks[index + 1] * block_frames
+        kept.append((span_start, pause_start + keep_half))
+        span_start = pause_end - keep_half
+    kept.append((span_start, last))
+
+    spans = []
+    out_position = 0
+    for start, end in kept:
+        spans.append((float(out_position) / rate, float(start) / rate, float(end - start) / rate, 1.0))
+        out_position += end - start
+    processed = np.concatenate([audio[start:end] for start, end in kept])
+    return processed, TimeMap(spans, origin=origin)
+
+
+def wsola_speedup(audio, rate, speed, frame_seconds=0.03, tolerance_seconds=0.01, origin=0.0, base=None):
+    """Pitch-preserving time compression (WSOLA).
+
+    Output frames are taken every hop_out = frame/2 samples from input
+    positions advancing by hop_out * speed, each shifted by up to the
+    tolerance to best match the natural continuation of the previous frame,
+    then overlap-added with a Hann window. Returns the compressed audio and a
+    TimeMap back to the input (chained to `base` if given).
+    """
+    if speed == 1.0 or len(audio) == 0:
+        return audio, TimeMap.identity(len(audio) / rate, origin=origin) if base is None else base
+    win = int(rate * frame_seconds) // 2 * 2
+    hop = win // 2
+    tolerance = int(rate * tolerance_seconds)
+    mono = audio.mean(axis=1) if audio.ndim > 1 else audio
+    n_frames = max(1, int((len(audio) - win - tolerance) / (hop * speed)))
+
+    # Pick frame positions; the search for each frame is one vectorized correlation
+    padded = np.pad(mono, (tolerance, win + tolerance))
+    positions = np.empty(n_frames, dtype=np.int64)
+    positions[0] = 0
+    for k in range(1, n_frames):
+        natural = positions[k - 1] + hop
+        template = padded[natural + tolerance:natural + tolerance + win]
+        nominal = int(k * hop * speed)
+        region = padded[nominal:nominal + 2 * tolerance + win]
+        candidates = np.lib.stride_tricks.sliding_window_view(region, win)
+        best = int(np.argmax(candidates @ template))
+        positions[k] = min(max(nominal + best - tolerance, 0), len(audio) - win)
+
+    # Gather all frames at once and overlap-add the half-overlapping halves
+    window = np.hanning(win + 1)[:win].astype(np.float32)  # periodic Hann sums to 1 at 50%
+    index = positions[:, None] + np.arange(win)
+    frames = audio[index]
+    frames = frames * (window[:, None] if audio.ndim > 1 else window)
+    middle = frames[:-1, hop:] + frames[1:, :hop]
+    output = np.concatenate([frames[0, :hop], middle.reshape(-1, *audio.shape[1:]), frames[-1, hop:]])
+
+    spans = []
+    for k in range(n_frames - 1):
+        spans.append((k * hop / rate, float(positions[k]) / rate, hop / rate,
+                      float(positions[k + 1] - positions[k]) / hop))
+    # Nothing follows the last frame, so all of it plays at normal speed up to the end of the output
+    last = n_frames - 1
+    spans.append((last * hop / rate, float(positions[last]) / rate, (len(output) - last * hop) / rate, 1.0))
+    return output.astype(audio.dtype, copy=False), TimeMap(spans, origin=origin, base=base)
+
+
+def coalesce_wavs(wav_list, gap_seconds=0.3):
+    """Join several WAV files of the same format with silence in between.
+
+    Returns the merged WAV bytes and the (start, end) of each input within
+    the merged audio, in seconds.
+    """
+    parts = []
+    params = None
+    for wav_bytes in wav_list:
+        with wave.open(io.BytesIO(wav_bytes), 'rb') as wav:
+            if params is None:
+                params = wav.getparams()
+            parts.append(wav.readframes(wav.getnframes()))
+    channels, sample_width, rate = params.nchannels, params.sampwidth, params.framerate
+    frame_bytes = channels * sample_width
+    gap = b"\x00" * (int(gap_seconds * rate) * frame_bytes)
+
+    offsets = []
+    position = 0
+    for index, part in enumerate(parts):
+        if index:
+            position += len(gap)
+        offsets.append((position / frame_bytes / rate, (position + len(part)) / frame_bytes / rate))
+        position += len(part)
+
+    merged = io.BytesIO()
+    with wave.open(merged, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(sample_width)
+        wav.setframerate(rate)
+        wav.writeframes(gap.join(parts))
+    return merged.getvalue(), offsets
+
+
+def split_segments(segments, offsets):
+    """Assign Whisper segments of a coalesced request back to its inputs.
+
+    Each segment goes to the input whose span contains its midpoint (or the
+    nearest one), with times shifted to be relative to that input. Returns
+    one (text, segments) pair per input.
+    """
+    split = [[] for _ in offsets]
+    for segment in segments:
+        middle = (segment["start"] + segment["end"]) / 2
+        distances = [0 if start <= middle <= end else min(abs(middle - start), abs(middle - end))
+                     for start, end in offsets]
+        index = distances.index(min(distances))
+        start, end = offsets[index]
+        segment = dict(segment)
+        segment["start"] = min(max(segment["start"] - start, 0.0), end - start)
+        segment["end"] = min(max(segment["end"] - start, 0.0), end - start)
+        split[index].append(segment)
+    return [("".join(segment["text"] for segment in part).strip(), part) for part in split]
@@ -0,0 +1,229 @@
+import os
+import sys
+import json
+import glob
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from dotenv import load_dotenv
+from transcription_backends import create_backend
+from translation_backends import create_translator
+from long_audio import transcribe_file
+from ffmpeg_source import MEDIA_EXTENSIONS
+
+AUDIO_EXTENSIONS = (".wav",) + MEDIA_EXTENSIONS
+
+
+def find_inputs(patterns):
+    """Expand directories (recursively) and glob patterns into a sorted file list"""
+    files = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _, names in os.walk(pattern):
+                for name in names:
+                    if name.lower().endswith(AUDIO_EXTENSIONS):
+                        files.add(os.path.join(root, name))
+        else:
+            for path in glob.glob(pattern, recursive=True):
+                if os.path.isfile(path):
+                    files.add(path)
+    return sorted(os.path.abspath(path) for path in files)
+
+
+def srt_time(seconds):
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
+
+def format_srt(segments):
+    lines = []
+    for index, segment in enumerate(segments, 1):
+        lines.append(str(index))
+        lines.append(f"{srt_time(segment['start'])} --> {srt_time(segment['end'])}")
+        lines.append(segment["text"].strip())
+        if segment.get("translation"):
+            lines.append(segment["translation"].strip())
+        lines.append("")
+    return "\n".join(lines)
+
+
+def write_atomic(path, text):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        file.write(text)
+    os.replace(tmp_path, path)
+
+
+class Manifest:
+    """Append-only JSONL record of finished files, used to resume after a crash"""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # Partial line from an interrupted write
+                    if entry.get("status") == "done":
+                        self.done.add(entry["file"])
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.file = open(path, "a", encoding="utf-8")
+
+    def record(self, entry):
+        self.file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        if entry.get("status") == "done":
+            self.done.add(entry["file"])
+
+    def close(self):
+        self.file.close()
+
+
+class BatchTranscriber:
+    def __init__(self, backend, translator=None, target_lang="ZH", retries=3, retry_delay=2.0,
+                 chunk_workers=2):
+        self.backend = backend
+        self.chunk_workers = chunk_workers
+        self.translator = translator
+        self.target_lang = target_lang
+        self.retries = retries
+        self.retry_delay = retry_delay
+
+    def transcribe_file(self, path):
+        # Long files are streamed and split at silences to fit the API limits
+        result = transcribe_file(path, self.backend, workers=self.chunk_workers)
+        if self.translator:
+            for segment in result["segments"]:
+                if segment["text"].strip():
+                    segment["translation"] = self.translator.translate(segment["text"], self.target_lang)
+            # Built from the segment translations rather than translating the whole text again
+            translations = [segment["translation"].strip() for segment in result["segments"]
+                            if segment.get("translation")]
+            if translations:
+                result["translation"] = " ".join(translations)
+        return result
+
+    def process(self, path):
+        """Transcribe one file, retrying with exponential backoff"""
+        for attempt in range(self.retries + 1):
+            try:
+                return self.transcribe_file(path)
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                delay = self.retry_delay * (2 ** attempt)
+                print(f"{os.path.basename(path)}: {e}, retrying in {delay:.0f}s", file=sys.stderr)
+                time.sleep(delay)
+
+
+def output_path(output_dir, base_dir, path, extension):
+    relative = os.path.relpath(path, base_dir) if base_dir else os.path.basename(path)
+    return os.path.join(output_dir, os.path.splitext(relative)[0] + extension)
+
+
+def run_batch(files, transcriber, output_dir, formats, manifest, workers=4):
+    pending_files = [path for path in files if path not in manifest.done]
+    skipped = len(files) - len(pending_files)
+    if skipped:
+        print(f"Resuming: {skipped} of {len(files)} files already done", file=sys.stderr)
+    # Output files mirror the input tree below the common directory
+    base_dir = os.path.commonpath([os.path.dirname(path) for path in files]) if files else None
+
+    results_file = open(os.path.join(output_dir, "results.jsonl"), "a", encoding="utf-8") \
+        if "jsonl" in formats else None
+    total = len(pending_files)
+    completed = 0
+    failed = 0
+    start = time.monotonic()
+    remaining = iter(pending_files)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Keep only a bounded number of files in flight
+        in_flight = {}
+        for path in remaining:
+            in_flight[executor.submit(transcriber.process, path)] = path
+            if len(in_flight) >= workers * 2:
+                break
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = in_flight.pop(future)
+                completed += 1
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failed += 1
+                    manifest.record({"file": path, "status": "failed", "error": str(e)})
+                    print(f"[{completed}/{total}] FAILED {path}: {e}", file=sys.stderr)
+                else:
+                    if "srt" in formats:
+                        write_atomic(output_path(output_dir, base_dir, path, ".srt"),
+                                     format_srt(result["segments"]))
+                    if results_file:
+                        record = {"file": path}
+                        record.update(result)
+                        results_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                        results_file.flush()
+                    # Only mark the file done once its outputs are written
+                    manifest.record({"file": path, "status": "done"})
+                    elapsed = time.monotonic() - start
+                    eta = elapsed / completed * (total - completed)
+                    print(f"[{completed}/{total}] {os.path.basename(path)} "
+                          f"({elapsed:.0f}s elapsed, ETA {eta:.0f}s)", file=sys.stderr)
+
+                next_path = next(remaining, None)
+                if next_path is not None:
+                    in_flight[executor.submit(transcriber.process, next_path)] = next_path
+
+    if results_file:
+        results_file.close()
+    print(f"Finished: {completed - failed} done, {failed} failed, {skipped} skipped", file=sys.stderr)
+    return failed
+
+
+def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Transcribe and translate a directory of recordings")
+    parser.add_argument("inputs", nargs="+", help="Directories or glob patterns")
+    parser.add_argument("-o", "--output-dir", default="transcripts")
+    parser.add_argument("-f", "--format", nargs="+", default=["jsonl", "srt"], choices=["jsonl", "srt"])
+    parser.add_argument("-j", "--workers", type=int, default=4)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--backend", choices=["groq", "local"], default=None)
+    parser.add_argument("--target-lang", default="ZH")
+    parser.add_argument("--no-translate", action="store_true")
+    parser.add_argument("--manifest", default=None,
+                        help="Resume manifest (default: <output-dir>/manifest.jsonl)")
+    args = parser.parse_args(argv)
+
+    files = find_inputs(args.inputs)
+    if not files:
+        print("No input files found", file=sys.stderr)
+        return 1
+    os.makedirs(args.output_dir, exist_ok=True)
+    manifest = Manifest(args.manifest or os.path.join(args.output_dir, "manifest.jsonl"))
+    backend = create_backend(args.backend)
+    translator = None if args.no_translate else create_translator(target_lang=args.target_lang)
+    transcriber = BatchTranscriber(backend, translator, args.target_lang, retries=args.retries)
+    try:
+        failed = run_batch(files, transcriber, args.output_dir, args.format, manifest, args.workers)
+    finally:
+        manifest.close()
+        backend.close()
+        if translator:
+            translator.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+from dotenv import load_dotenv
+
+from wav_io import WavReader, encode_pcm16, to_mono_16k
+from audio_preprocess import wsola_speedup
+from transcription_backends import create_backend
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "samples")
+
+
+def tokens(text):
+    """Words for languages with spaces, characters otherwise (e.g. Chinese)"""
+    text = text.lower().strip()
+    if any("\u3040" <= char <= "\u9fff" for char in text):
+        return [char for char in text if not char.isspace() and char not in "，。！？、"]
+    return [word.strip(".,!?;:\"'") for word in text.split()]
+
+
+def error_rate(reference, hypothesis):
+    """Word (or character) error rate: edit distance / reference length"""
+    ref = tokens(reference)
+    hyp = tokens(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_token in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_token in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1,
+                             previous[j - 1] + (ref_token != hyp_token))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def load_audio(path):
+    """16 kHz mono float32 audio from a WAV file"""
+    with WavReader(path) as reader:
+        pcm = to_mono_16k(reader.frames(0, reader.n_frames), reader.rate)
+    return pcm.astype(np.float32) / 32768
+
+
+def reference_text(path, backend, audio):
+    """Text from a sidecar .txt file if present, otherwise the 1.0x transcript"""
+    sidecar = os.path.splitext(path)[0] + ".txt"
+    if os.path.exists(sidecar):
+        with open(sidecar, "r", encoding="utf-8") as file:
+            return file.read()
+    return backend.transcribe(encode_pcm16((audio * 32767).astype(np.int16), 16000))["text"]
+
+
+def run(paths, speeds, backend):
+    totals = {speed: {"error": 0.0, "latency": 0.0, "seconds": 0.0} for speed in speeds}
+    for path in paths:
+        audio = load_audio(path)
+        reference = reference_text(path, backend, audio)
+        for speed in speeds:
+            compressed, _ = wsola_speedup(audio, 16000, speed)
+            wav_bytes = encode_pcm16((np.clip(compressed, -1, 1) * 32767).astype(np.int16), 16000)
+            start = time.perf_counter()
+            text = backend.transcribe(wav_bytes)["text"]
+            latency = time.perf_counter() - start
+            error = error_rate(reference, text)
+            totals[speed]["error"] += error
+            totals[speed]["latency"] += latency
+            totals[speed]["seconds"] += len(compressed) / 16000
+            print(f"{os.path.basename(path)} x{speed:.2f}: error {error:.1%}, "
+                  f"latency {latency:.2f}s, {len(compressed) / 16000:.1f}s billed")
+
+    print("\nspeed  error  latency  billed")
+    for speed in speeds:
+        total = totals[speed]
+        print(f"x{speed:.2f}  {total['error'] / len(paths):6.1%}  {total['latency'] / len(paths):6.2f}s"
+              f"  {total['seconds']:6.1f}s")
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Measure accuracy and latency of time-compressed audio")
+    parser.add_argument("files", nargs="*", help=f"WAV files (default: *.wav in {SAMPLES_DIR})")
+    parser.add_argument("--speeds", nargs="+", type=float, default=[1.0, 1.1, 1.2, 1.3, 1.4, 1.5])
+    parser.add_argument("--backend", choices=["groq", "local"], default=None)
+    args = parser.parse_args()
+
+    paths = args.files
+    if not paths and os.path.isdir(SAMPLES_DIR):
+        paths = sorted(os.path.join(SAMPLES_DIR, name) for name in os.listdir(SAMPLES_DIR)
+                       if name.endswith(".wav"))
+    if not paths:
+        print(f"No WAV files given and none found in {SAMPLES_DIR}")
+        sys.exit(1)
+    backend = create_backend(args.backend, cache=False)
+    try:
+        run(paths, args.speeds, backend)
+    finally:
+        backend.close()
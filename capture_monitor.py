@@ -0,0 +1,85 @@
+import time
+import logging
+import threading
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+
+class CaptureMonitor:
+    """Detects audio lost by the capture loop by comparing frames received with wall-clock time.
+
+    The device delivers `rate` frames per second, so while nothing is lost
+    the lag of frames received behind elapsed time stays at the device
+    latency, give or take `drift` of clock mismatch. A stall of the capture
+    thread makes the lag jump, but if the device buffer held the audio the
+    next reads return at once and catch up. A gap is only recorded when the
+    lag is still higher by more than `tolerance` seconds on a live read, one
+    that waited about as long as the audio it returned. Ring overruns,
+    where the segmenter fell behind capture, are counted separately.
+    """
+
+    def __init__(self, rate, tolerance=0.03, drift=200e-6, max_gaps=1000):
+        self.rate = rate
+        self.tolerance = tolerance  # seconds
+        self.drift = drift  # seconds of clock mismatch allowed per second
+        self.lock = threading.Lock()
+        self.gaps = deque(maxlen=max_gaps)  # (ring frame where capture resumed, frames lost)
+        self.gap_count = 0
+        self.lost_frames = 0
+        self.captured_frames = 0
+        self.overruns = 0
+        self.overrun_frames = 0
+        self.start_time = None
+        self.frames = 0
+        self.floor = None
+
+    def start(self):
+        """Begin a capture run; totals carry over for the whole session"""
+        self.start_time = time.perf_counter()
+        self.frames = 0
+        self.floor = None
+
+    def update(self, position, frames, read_start, read_end):
+        """Called by the capture thread for each read (perf_counter times) written at ring `position`"""
+        elapsed = read_end - self.start_time
+        self.frames += frames
+        self.captured_frames += frames
+        lag = elapsed * self.rate * (1 - self.drift) - self.frames
+        # The smallest lag seen is the device latency
+        if self.floor is None or lag < self.floor:
+            self.floor = lag
+        excess = lag - self.floor
+        # A live read means the device buffer is empty, so whatever is still missing is lost
+        live = 0.5 <= (read_end - read_start) * self.rate / frames <= 1.5
+        if live and excess > self.tolerance * self.rate:
+            self.floor = lag
+            self.record_gap(position, int(excess))
+
+    def record_gap(self, position, frames):
+        with self.lock:
+            self.gaps.append((position, frames))
+            self.gap_count += 1
+            self.lost_frames += frames
+        lost_ms = frames / self.rate * 1000
+        log.warning("Capture gap: %.0f ms of audio lost", lost_ms, extra={"lost_ms": round(lost_ms)})
+
+    def overrun(self, frames):
+        with self.lock:
+            self.overruns += 1
+            self.overrun_frames += frames
+
+    def lost_in(self, start, end):
+        """Milliseconds lost inside ring frames [start, end)"""
+        with self.lock:
+            frames = sum(lost for position, lost in self.gaps if start < position < end)
+        return frames / self.rate * 1000
+
+    def summary(self):
+        captured = self.captured_frames / self.rate
+        lost_ms = self.lost_frames / self.rate * 1000
+        share = lost_ms / 10 / captured if captured else 0
+        text = f"Capture: {self.gap_count} gaps, {lost_ms:.0f} ms lost in {captured:.0f} s ({share:.2f}%)"
+        if self.overruns:
+            text += f", {self.overruns} ring overruns ({self.overrun_frames / self.rate * 1000:.0f} ms not segmented)"
+        return text
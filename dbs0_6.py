@@ -2,22 +2,51 @@ import sys
 import time
 import soundcard as sc
 import numpy as np
-import wave
-from io import BytesIO
 import os
 from groq import Groq
 from dotenv import load_dotenv
 import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import requests
+import logging
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
-                            QHBoxLayout, QTextEdit, QLabel, QSplitter, QPushButton,
+                            QHBoxLayout, QPlainTextEdit, QLabel, QSplitter, QPushButton,
                             QGridLayout, QFrame, QSlider)
 from PyQt6.QtCore import Qt, QObject, pyqtSignal, QThread, QSize, QRect
 from PyQt6.QtGui import QResizeEvent, QPalette, QColor
 import pythoncom  # Add this import at the top with other imports
+import multiprocessing
+from transcription_backends import create_backend
+from translation_backends import create_translator
+from offline_spool import OfflineSpool
+from transcript_view import TranscriptModel, TranscriptView
+from ui_scheduler import UiUpdateScheduler
+from ui_watchdog import EventLoopWatchdog
+from history_store import HistoryStore
+from audio_archive import AudioArchiveWriter
+from app_logging import setup_logging, StatusLogHandler, STATUS_LOGGER
+from utterance import Utterance
+from wav_io import wav_header
+from preprocess_pool import PcmRing, PreprocessPool, RingOverrun
+from audio_preprocess import coalesce_wavs
+from segment_queue import SegmentQueue
+from async_pipeline import AsyncPipeline
+from capture_monitor import CaptureMonitor
+import metrics
+
+log = logging.getLogger(__name__)
+status_log = logging.getLogger(STATUS_LOGGER)
+
+UPLOAD_URL = 'https://https-dbs.vercel.app/api/addRecord'
 
 class AudioWorker(QThread):
-    audio_ready = pyqtSignal(BytesIO)
+    audio_ready = pyqtSignal(object)  # Utterance
+    partial_audio_ready = pyqtSignal(object)  # WAV of the still-open segment
+    speculative_audio_ready = pyqtSignal(int, object)  # segment id, Utterance
+    speculation_confirmed = pyqtSignal(int)
+    speculation_cancelled = pyqtSignal(int)
     error = pyqtSignal(str)
     sound_level = pyqtSignal(float)
 
@@ -25,113 +54,672 @@ class AudioWorker(QThread):
         super().__init__()
         self.running = False
         self.threshold = 0.01  # Default threshold
-        self.buffer = []  # Store audio segments
-        self.silence_duration = 0
-        self.SILENCE_THRESHOLD = 0.4  # 1 second of silence indicates sentence end
+        self.silence_duration = 0  # Seconds of silence since the last voiced block
+        self.SAMPLE_RATE = 48000
+        self.CHANNELS = 2
+        self.BLOCK_SIZE = 4800  # 100 ms blocks so short pauses can be detected
+        self.BLOCK_DURATION = self.BLOCK_SIZE / self.SAMPLE_RATE
+        self.CAPTURE_CHUNK = 960  # 20 ms device reads, so a stop is noticed almost at once
+        self.SILENCE_THRESHOLD = 1.0  # Seconds of silence that end a sentence (one silent 1 s block before)
+        # The capture thread only copies blocks into a shared-memory ring; the
+        # segmenter thread reads them and worker processes do the heavy lifting
+        self.RING_SECONDS = 60
+        self.PREPROCESS_WORKERS = 2  # 0 runs preprocessing in the segmenter thread
+        self.ring = None
+        self.pool = None
+        # Runs start on their own thread, which waits for the previous run to end
+        self.starter = ThreadPoolExecutor(max_workers=1)
+        self.run_lock = threading.Lock()
+        self.generation = 0  # Bumped by every start and stop; a start only goes ahead if still current
+        self.blocks = queue.Queue()  # (start frame, frames, capture time) of each new block
+        self.segmenter = None
+        self.deliveries = deque()  # (future or None, handler) in dispatch order
+        self.delivery_lock = threading.Lock()
+        # The open segment is frames [segment_start, segment_start + segment_frames) of the ring
+        self.segment_start = None
+        self.segment_frames = 0
+        # Interim results: re-send the growing segment while it is still open
+        self.interim_enabled = True
+        self.INTERIM_INTERVAL = 1.0  # seconds between interim snapshots
+        self.INTERIM_WINDOW = 15  # only the latest N seconds are re-sent
+        self.last_interim_time = 0
+        # Speculative dispatch: send the segment after a short pause and
+        # cancel it if speech resumes before SILENCE_THRESHOLD is reached
+        self.speculation_enabled = True
+        self.SPECULATIVE_PAUSE = 0.2  # seconds
+        self.segment_id = 0
+        self.speculative_id = None
+        self.speculation_stats = {"dispatched": 0, "won": 0, "lost": 0}
+        self.speculative_sent = {}  # id -> seconds of audio in the speculative request
+        # Pre-upload trimming: cut edge silence and shorten long pauses
+        self.trim_enabled = True
+        self.MAX_PAUSE = 0.5  # pauses longer than this...
+        self.KEPT_PAUSE = 0.2  # ...are shortened to this
+        self.segment_start_time = None  # Capture time of the first buffered block
+        # Optional time compression (1.0 = off, unmeasured; see samples/README.md); fewer billed seconds
+        self.SPEEDUP = 1.0
+        self.archive = None  # AudioArchiveWriter keeping the untrimmed audio of each utterance
+        # Compares frames received with wall-clock time to find audio lost in capture
+        self.capture = CaptureMonitor(self.SAMPLE_RATE)
+        self.mark_gaps = True  # Record lost capture time on the affected utterances
     
     def calculate_rms(self, audio_data):
         return np.sqrt(np.mean(np.square(audio_data)))
-        
+
+    def open(self):
+        """Create the ring and start the worker processes (slow the first time)"""
+        if self.ring is None:
+            self.ring = PcmRing.create(int(self.RING_SECONDS * self.SAMPLE_RATE), self.CHANNELS)
+            self.pool = PreprocessPool(self.ring, self.PREPROCESS_WORKERS)
+
+    def close(self):
+        """Stop, wait for capture and segmentation to end, then release the workers and ring"""
+        self.stop()
+        self.starter.shutdown(wait=True)
+        self.wait()
+        if self.segmenter is not None:
+            self.segmenter.join()
+            self.segmenter = None
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+    def deliver(self, future, handler):
+        """Run handler(result) in dispatch order, even if workers finish out of order"""
+        with self.delivery_lock:
+            self.deliveries.append((future, handler))
+        if future is None:
+            self.flush_deliveries()
+        else:
+            future.add_done_callback(lambda _: self.flush_deliveries())
+
+    def flush_deliveries(self):
+        with self.delivery_lock:
+            while self.deliveries:
+                future, handler = self.deliveries[0]
+                if future is not None and not future.done():
+                    break
+                self.deliveries.popleft()
+                try:
+                    handler(future.result() if future is not None else None)
+                except Exception as e:
+                    log.debug("Preprocessing error", exc_info=True)
+                    self.error.emit(f"Preprocessing Error: {str(e)}")
+
+    def submit(self, start, count, **options):
+        options.update(rate=self.SAMPLE_RATE, origin=self.segment_start_time)
+        metrics.in_flight.inc("preprocess")
+        submitted = time.perf_counter()
+        future = self.pool.submit(start, count, options)
+
+        def done(_):
+            metrics.stage_latency.observe(time.perf_counter() - submitted, "preprocess")
+            metrics.in_flight.dec("preprocess")
+        future.add_done_callback(done)
+        return future
+
+    def count_audio(self, segment_seconds, sent_seconds):
+        """Split a finished segment into audio sent for transcription and audio trimmed away"""
+        metrics.audio_seconds.inc("processed", amount=sent_seconds)
+        metrics.audio_seconds.inc("skipped", amount=max(segment_seconds - sent_seconds, 0))
+
+    def segment_options(self):
+        return dict(trim=self.trim_enabled, threshold=self.threshold, max_pause=self.MAX_PAUSE,
+                    keep_pause=self.KEPT_PAUSE, speedup=self.SPEEDUP)
+
+    def make_utterance(self, seq, result, lost_ms=0):
+        """Wrap a prepared segment; capture times span the speech kept after trimming"""
+        time_map = result["time_map"]
+        wav = memoryview(result["wav"]) if result["wav"] is not None else wav_header(0, self.CHANNELS, self.SAMPLE_RATE)
+        pcm = np.frombuffer(wav, dtype=np.int16, offset=44).reshape(-1, self.CHANNELS)
+        utterance = Utterance(seq, time_map.to_capture(0), time_map.to_capture(time_map.duration),
+                              pcm=pcm, audio=wav, time_map=time_map)
+        utterance.lost_ms = lost_ms
+        utterance.mark("captured")
+        if lost_ms:
+            log.info("Segment %d is missing %.0f ms of captured audio", seq, lost_ms)
+        return utterance
+
+    def segment_lost_ms(self):
+        if not self.mark_gaps:
+            return 0
+        return self.capture.lost_in(self.segment_start, self.segment_start + self.segment_frames)
+
+    def emit_interim(self):
+        """Send a snapshot of the still-open segment for a provisional transcript"""
+        now = time.monotonic()
+        if now - self.last_interim_time < self.INTERIM_INTERVAL:
+            return
+        self.last_interim_time = now
+        count = min(self.segment_frames, int(self.INTERIM_WINDOW * self.SAMPLE_RATE))
+        future = self.submit(self.segment_start + self.segment_frames - count, count)
+
+        def handle(result):
+            if result["wav"] is not None:
+                self.partial_audio_ready.emit(memoryview(result["wav"]))
+        self.deliver(future, handle)
+
+    def dispatch_speculative(self):
+        self.segment_id += 1
+        self.speculative_id = segment_id = self.segment_id
+        self.speculation_stats["dispatched"] += 1
+        lost_ms = self.segment_lost_ms()
+        future = self.submit(self.segment_start, self.segment_frames, **self.segment_options())
+
+        def handle(result):
+            self.speculative_sent[segment_id] = result["time_map"].duration
+            self.speculative_audio_ready.emit(segment_id, self.make_utterance(segment_id, result, lost_ms))
+        self.deliver(future, handle)
+
+    def cancel_speculative(self):
+        """Speech resumed after a speculative dispatch; the request is stale"""
+        self.speculation_stats["lost"] += 1
+        segment_id = self.speculative_id
+
+        def handle(_):
+            self.speculative_sent.pop(segment_id, None)
+            self.speculation_cancelled.emit(segment_id)
+        self.deliver(None, handle)
+        self.speculative_id = None
+
+    def archive_result(self, result, capture_start):
+        if self.archive is not None and result["archive"] is not None:
+            self.archive.append_pcm(result["archive"], capture_start)
+
+    def finish_segment(self):
+        archive = self.archive is not None
+        capture_start = self.segment_start_time
+        segment_seconds = self.segment_frames / self.SAMPLE_RATE
+        if self.speculative_id is not None:
+            # Only silence was added since the speculative dispatch, so it wins
+            self.speculation_stats["won"] += 1
+            if archive:
+                future = self.submit(self.segment_start, self.segment_frames, archive=True, prepare=False)
+                self.deliver(future, lambda result: self.archive_result(result, capture_start))
+            segment_id = self.speculative_id
+
+            def confirm(_):
+                self.count_audio(segment_seconds, self.speculative_sent.pop(segment_id, 0))
+                self.speculation_confirmed.emit(segment_id)
+            self.deliver(None, confirm)
+        else:
+            self.segment_id += 1
+            segment_id = self.segment_id
+            lost_ms = self.segment_lost_ms()
+            future = self.submit(self.segment_start, self.segment_frames, archive=archive,
+                                 **self.segment_options())
+
+            def handle(result):
+                self.archive_result(result, capture_start)
+                self.count_audio(segment_seconds, result["time_map"].duration)
+                if result["wav"] is not None:
+                    self.audio_ready.emit(self.make_utterance(segment_id, result, lost_ms))
+            self.deliver(future, handle)
+
+    def reset_segment(self):
+        self.segment_start = None
+        self.segment_frames = 0
+        self.silence_duration = 0
+        self.last_interim_time = 0
+        self.speculative_id = None
+
+    def speculation_summary(self):
+        stats = self.speculation_stats
+        if not stats["dispatched"]:
+            return "Speculation: no segments dispatched"
+        win_rate = stats["won"] / stats["dispatched"] * 100
+        return (f"Speculation: {stats['dispatched']} dispatched, {stats['won']} won, "
+                f"{stats['lost']} cancelled ({win_rate:.0f}% win rate)")
+
+    def process_block(self, start, count, captured_at, data):
+        rms = self.calculate_rms(data)
+        self.sound_level.emit(rms)
+
+        if rms > self.threshold:
+            if self.speculative_id is not None:
+                self.cancel_speculative()
+            if self.segment_start is None:
+                self.segment_start = start
+                self.segment_start_time = captured_at - count / self.SAMPLE_RATE
+            self.segment_frames += count
+            self.silence_duration = 0
+            if self.interim_enabled and self.running:
+                self.emit_interim()
+        elif self.segment_start is not None:
+            # Keep pauses inside the segment; they are trimmed before upload
+            self.segment_frames += count
+            self.silence_duration += count / self.SAMPLE_RATE
+
+            if (self.speculation_enabled and self.speculative_id is None and
+                    self.silence_duration >= self.SPECULATIVE_PAUSE and self.running):
+                self.dispatch_speculative()
+
+            # If we have buffered data and detected sentence end
+            if self.silence_duration >= self.SILENCE_THRESHOLD:
+                # After a stop only a speculative dispatch is finished (confirmed); it
+                # must not be dropped with its request still pending
+                if self.running or self.speculative_id is not None:
+                    self.finish_segment()
+                self.reset_segment()
+                return
+        else:
+            metrics.audio_seconds.inc("skipped", amount=count / self.SAMPLE_RATE)
+
+        # The open segment must stay inside the ring; cut overly long ones
+        if self.segment_start is not None and self.segment_frames >= self.ring.frames // 2:
+            if self.speculative_id is not None:
+                self.cancel_speculative()
+            self.finish_segment()
+            self.reset_segment()
+
+    def segment_loop(self, blocks):
+        """Voice activity and segmentation on blocks from the ring; runs beside the capture thread"""
+        while True:
+            item = blocks.get()
+            if item is None:
+                # Capture stopped. Only silence followed a speculative dispatch, so it
+                # stands as the final segment; any other open segment is dropped
+                if self.speculative_id is not None:
+                    self.finish_segment()
+                self.reset_segment()
+                return
+            start, count, captured_at = item
+            try:
+                data = self.ring.read(start, count)
+                self.process_block(start, count, captured_at, data)
+            except RingOverrun as e:
+                log.warning("Segmenter fell behind capture: %s", e)
+                self.capture.overrun(count)
+                # The segment's audio is gone, so a speculative dispatch can't be confirmed
+                if self.speculative_id is not None:
+                    self.cancel_speculative()
+                self.reset_segment()
+            except Exception as e:
+                log.debug("Segmenter error", exc_info=True)
+                self.error.emit(f"Recording Error: {str(e)}")
+
     def run(self):
+        """Capture thread: read the device and copy it into the ring, nothing else"""
+        blocks = self.blocks
         try:
             # Initialize COM at the start of the thread
             pythoncom.CoInitializeEx(0)
             loopback = sc.get_microphone(id=str(sc.default_speaker().name), include_loopback=True)
-            while self.running:
-                with loopback.recorder(samplerate=48000) as mic:
-                    data = mic.record(numframes=48000)  # Record smaller chunks (1 second)
+            # Keep one recorder open so no audio is lost between blocks
+            with loopback.recorder(samplerate=self.SAMPLE_RATE, channels=self.CHANNELS) as mic:
+                block_start = None
+                self.capture.start()
+                while self.running:
+                    read_start = time.perf_counter()
+                    data = mic.record(numframes=self.CAPTURE_CHUNK)
+                    read_end = time.perf_counter()
                     if not self.running:
                         break
-                        
-                    rms = self.calculate_rms(data)
-                    self.sound_level.emit(rms)
-                    
-                    if rms > self.threshold:
-                        self.buffer.append(data)
-                        self.silence_duration = 0
-                    else:
-                        self.silence_duration += 1
-                        
-                        # If we have buffered data and detected sentence end
-                        if len(self.buffer) > 0 and self.silence_duration >= self.SILENCE_THRESHOLD:
-                            # Combine buffered audio segments
-                            complete_audio = np.concatenate(self.buffer)
-                            wav_buffer = BytesIO()
-                            with wave.open(wav_buffer, 'wb') as wav:
-                                wav.setnchannels(2)
-                                wav.setsampwidth(2)
-                                wav.setframerate(48000)
-                                wav.writeframes((complete_audio * 32767).astype(np.int16).tobytes())
-                            wav_buffer.seek(0)
-                            
-                            if self.running:
-                                self.audio_ready.emit(wav_buffer)
-                            
-                            # Clear buffer after sending
-                            self.buffer = []
-                            self.silence_duration = 0
+                    start = self.ring.write(data)
+                    self.capture.update(start, len(data), read_start, read_end)
+                    if block_start is None:
+                        block_start = start
+                    # Chunks are contiguous in the ring; hand over whole blocks
+                    frames = start + len(data) - block_start
+                    if frames >= self.BLOCK_SIZE:
+                        blocks.put((block_start, frames, time.time()))
+                        block_start = None
                     
         except Exception as e:
             self.error.emit(f"Recording Error: {str(e)}")
         finally:
+            blocks.put(None)  # Lets the segmenter finish
             pythoncom.CoUninitialize()  # Cleanup COM
             
     def start_recording(self):
-        self.buffer = []
-        self.silence_duration = 0
-        self.running = True
-        self.start()
+        """Returns at once; the run begins on the starter thread once the previous one has ended"""
+        with self.run_lock:
+            self.generation += 1
+            self.starter.submit(self.begin_run, self.generation)
+
+    def begin_run(self, generation):
+        try:
+            # A stop just before may still be in its last CAPTURE_CHUNK read,
+            # and the segmenter preprocessing the segment that stop confirmed
+            self.wait()
+            if self.segmenter is not None:
+                self.segmenter.join()
+            self.open()
+            with self.run_lock:
+                if generation != self.generation:
+                    return  # Stopped or restarted while waiting
+                self.reset_segment()
+                self.blocks = queue.Queue()
+                self.running = True
+                self.segmenter = threading.Thread(target=self.segment_loop, args=(self.blocks,), daemon=True)
+                self.segmenter.start()
+                self.start()
+        except Exception as e:
+            log.debug("Start error", exc_info=True)
+            self.error.emit(f"Recording Error: {str(e)}")
             
     def stop(self):
-        self.running = False
-        self.buffer = []
-        self.wait()
+        """Returns at once; capture ends after the current CAPTURE_CHUNK and the segmenter after it"""
+        with self.run_lock:
+            self.generation += 1
+            self.running = False
 
-class TranscriptionWorker(QThread):
-    text_ready = pyqtSignal(str)
+class TranscriptionWorker(QThread, SegmentQueue):
+    text_ready = pyqtSignal(object)  # Utterance with its text
+    partial_text_ready = pyqtSignal(str)
     error = pyqtSignal(str)
 
-    def __init__(self, groq_client):
+    def __init__(self, backend):
         super().__init__()
-        self.client = groq_client
-        self.queue = queue.Queue()
+        self.backend = backend  # GroqBackend or LocalWhisperBackend
+        self.transcribe_queue = queue.Queue()
+        self.target_lang = "ZH"
         self.running = True
+        # Only the latest interim snapshot is kept; older ones are stale
+        self.pending_partial = None
+        self.partial_generation = 0
+        self.PARTIAL_MIN_INTERVAL = 1.0  # seconds between interim requests
+        self.last_partial_time = 0
+        self.init_segment_queue()
+        self.finished.connect(self.resume)
+
+    def process_audio(self, utterance):
+        log.debug("Queuing utterance %s for transcription", utterance.seq)
+        # The segment is closed, so any interim snapshot of it is obsolete
+        self.partial_generation += 1
+        self.pending_partial = None
+        self.transcribe_queue.put((None, utterance))
+
+    def process_speculative(self, segment_id, utterance):
+        log.debug("Queuing speculative segment %d", segment_id)
+        self.partial_generation += 1
+        self.pending_partial = None
+        self.add_speculative(segment_id)
+        self.transcribe_queue.put((segment_id, utterance))
+
+    def confirm_speculative(self, segment_id):
+        utterance = self.take_confirmed(segment_id)
+        if utterance is not None:
+            self.emit_text(utterance)
+
+    def cancel_speculative(self, segment_id):
+        self.drop_speculative(segment_id)
+
+    def process_partial(self, wav_bytes):
+        self.pending_partial = (self.partial_generation, wav_bytes)
+
+    def transcribe(self, utterance, backend=None):
+        with metrics.timed("transcribe"):
+            transcription = (backend or self.backend).transcribe(utterance.audio)
+        utterance.set_text(transcription["text"], transcription["segments"])
+        return utterance
+
+    def emit_text(self, utterance):
+        if utterance.text.strip():
+            log.debug("Emitting transcription: %s", utterance.text)
+            self.text_ready.emit(utterance)
+
+    def run_partial(self):
+        pending = self.pending_partial
+        self.pending_partial = None
+        if pending is None:
+            return
+        generation, wav_bytes = pending
+        self.last_partial_time = time.monotonic()
+        with metrics.timed("partial"):
+            transcription = self.backend.uncached().transcribe(wav_bytes)
+        # Drop the result if the segment closed while the request was in flight
+        if generation == self.partial_generation and transcription["text"].strip():
+            self.partial_text_ready.emit(transcription["text"])
+
+    def run_speculative(self, segment_id, utterance):
+        if self.is_cancelled((segment_id, utterance)):
+            log.debug("Skipping cancelled speculative segment %d", segment_id)
+            return
+        try:
+            self.transcribe(utterance, self.backend.uncached())
+        except Exception:
+            self.segment_failed(segment_id, utterance)
+            raise
+        self.deliver_speculative(segment_id, utterance)
+
+    def deliver_speculative(self, segment_id, utterance):
+        if self.speculative_result(segment_id, utterance):
+            self.emit_text(utterance)
 
-    def process_audio(self, audio_buffer):
-        print("Queuing audio for transcription")
-        self.queue.put(audio_buffer)
+    def next_item(self):
+        if self.held_item is not None:
+            item, self.held_item = self.held_item, None
+            return item
+        return self.transcribe_queue.get()
+
+    def run_coalesced(self, batch):
+        log.debug("Coalescing %d short segments into one request", len(batch))
+        merged, offsets = coalesce_wavs([utterance.audio for _, utterance in batch], self.COALESCE_GAP)
+        try:
+            with metrics.timed("transcribe"):
+                transcription = self.uncached_if_speculative(batch).transcribe(merged)
+        except Exception:
+            for item in batch:
+                self.segment_failed(*item)
+            raise
+        self.split_coalesced(batch, offsets, transcription)
+        for segment_id, utterance in batch:
+            if segment_id is not None:
+                self.deliver_speculative(segment_id, utterance)
+            else:
+                self.emit_text(utterance)
 
     def run(self):
-        print("TranscriptionWorker started")
+        log.info("TranscriptionWorker started")
         while self.running:
             try:
-                if not self.queue.empty():
-                    audio_buffer = self.queue.get()
-                    print("Processing audio data")
-                    transcription = self.client.audio.transcriptions.create(
-                        file=("audio.wav", audio_buffer.read()),
-                        model="whisper-large-v3-turbo",
-                        response_format="verbose_json"
-                    )
-                    if transcription.text.strip():
-                        print(f"Emitting transcription: {transcription.text}")
-                        self.text_ready.emit(transcription.text)
+                if self.held_item is not None or not self.transcribe_queue.empty():
+                    item = self.next_item()
+                    if self.is_cancelled(item):
+                        log.debug("Skipping cancelled speculative segment %d", item[0])
+                        continue
+                    batch = self.collect_batch(item)
+                    if len(batch) > 1:
+                        self.run_coalesced(batch)
+                        continue
+                    segment_id, utterance = item
+                    if segment_id is not None:
+                        self.run_speculative(segment_id, utterance)
+                        continue
+                    log.debug("Processing utterance %s", utterance.seq)
+                    try:
+                        self.transcribe(utterance)
+                    except Exception:
+                        self.segment_failed(None, utterance)
+                        raise
+                    self.emit_text(utterance)
+                elif (self.pending_partial is not None and
+                        time.monotonic() - self.last_partial_time >= self.PARTIAL_MIN_INTERVAL):
+                    self.run_partial()
                 else:
                     self.msleep(100)
             except Exception as e:
-                print(f"TranscriptionWorker error: {e}")
+                log.debug("TranscriptionWorker error", exc_info=True)
                 self.error.emit(f"Transcription Error: {str(e)}")
 
     def stop(self):
-        print("Stopping transcription worker...")
+        """Returns at once; a request in flight finishes in the background and is still delivered"""
+        log.debug("Stopping transcription worker...")
+        self.running = False
+
+    def close(self):
+        """Wait for the request in flight, then spool everything still queued"""
         self.running = False
         self.wait()
+        self.spool_queued()
 
     def start_processing(self):
-        print("Starting transcription processing...")
+        log.debug("Starting transcription processing...")
+        self.pending_partial = None
+        self.running = True
+        # If the previous run is still finishing a request it just carries on
+        if not self.isRunning():
+            self.start()
+
+    def resume(self):
+        # Started again while the previous run was leaving its loop
+        if self.running:
+            self.wait()
+            self.start()
+
+class SpoolWorker(QThread):
+    """Replays spooled segments and translations once the network is back"""
+    text_ready = pyqtSignal(object)  # Utterance
+    translation_ready = pyqtSignal(object)  # Utterance
+    backlog_changed = pyqtSignal(int, int)
+
+    def __init__(self, spool, backend, translator, concurrency=2):
+        super().__init__()
+        self.spool = spool
+        self.backend = backend
+        self.translator = translator
+        self.concurrency = concurrency
+        self.RETRY_MIN = 5  # seconds between drain attempts
+        self.RETRY_MAX = 120  # back off to this while offline
+        self.wake = threading.Event()
+        self.running = False
+        self.last_counts = None
+
+    def replay_audio(self, wav_bytes, meta):
+        utterance = Utterance.from_meta(meta, audio=wav_bytes)
+        with metrics.timed("replay"):
+            utterance.text = self.backend.transcribe(wav_bytes)["text"]
+        utterance.mark("transcribed")
+        if utterance.text.strip():
+            self.text_ready.emit(utterance)
+
+    def replay_text(self, text, meta):
+        utterance = Utterance.from_meta(meta, text=text)
+        with metrics.timed("replay"):
+            utterance.translation = self.translator.translate(text, meta.get("target_lang", "ZH"))
+        utterance.mark("translated")
+        self.translation_ready.emit(utterance)
+
+    def report_backlog(self):
+        counts = self.spool.counts()
+        if counts != self.last_counts:
+            self.last_counts = counts
+            self.backlog_changed.emit(*counts)
+
+    def run(self):
+        delay = self.RETRY_MIN
+        while self.running:
+            try:
+                self.report_backlog()
+                if self.spool.drain(self.replay_audio, self.replay_text, self.concurrency):
+                    delay = self.RETRY_MIN
+                else:
+                    delay = min(delay * 2, self.RETRY_MAX)
+                self.report_backlog()
+            except Exception as e:
+                log.exception("SpoolWorker error: %s", e)
+            self.wake.wait(delay)
+            self.wake.clear()
+
+    def start_draining(self):
         self.running = True
         self.start()
 
+    def stop(self):
+        self.running = False
+        self.wake.set()
+        self.wait()
+
+class TranslationWorker(QThread):
+    """Translates and uploads utterances off the UI thread (the QThread pipeline)"""
+    translation_ready = pyqtSignal(object)  # Utterance with its translation
+    error = pyqtSignal(str)
+
+    def __init__(self, translator, spool, upload_url=UPLOAD_URL, target_lang="ZH"):
+        super().__init__()
+        self.translator = translator
+        self.spool = spool
+        self.upload_url = upload_url
+        self.target_lang = target_lang
+        self.queue = queue.Queue()  # (needs translation, utterance); None wakes the thread to stop
+        self.running = False
+        self.TRANSLATE_ATTEMPTS = 2
+        self.TRANSLATE_RETRY_DELAY = 0.2  # seconds
+        self.UPLOAD_TIMEOUT = 10  # seconds
+
+    def translate_text(self, utterance):
+        self.queue.put((True, utterance))
+
+    def publish(self, utterance):
+        """Show and upload an utterance translated elsewhere (spool replay)"""
+        self.queue.put((False, utterance))
+
+    def spool_text(self, utterance):
+        self.spool.spool_text(utterance.text, dict(utterance.meta(), target_lang=self.target_lang))
+
+    def translate(self, utterance):
+        for attempt in range(self.TRANSLATE_ATTEMPTS):
+            try:
+                with metrics.timed("translate"):
+                    utterance.translation = self.translator.translate(utterance.text, self.target_lang)
+            except Exception as e:
+                if attempt < self.TRANSLATE_ATTEMPTS - 1:
+                    self.error.emit(f"Translation Error: {str(e)}, retrying...")
+                    time.sleep(self.TRANSLATE_RETRY_DELAY)
+                    continue
+                self.spool_text(utterance)
+                self.error.emit(f"Translation Error: {str(e)}, spooled for retry")
+                return False
+            utterance.mark("translated")
+            return True
+
+    def upload(self, utterance):
+        payload = {
+            "original_text": utterance.text,
+            "translated_text": utterance.translation
+        }
+        try:
+            with metrics.timed("upload"):
+                response = requests.post(self.upload_url, json=payload, timeout=self.UPLOAD_TIMEOUT)
+            metrics.bytes_uploaded.inc("records", amount=len(response.request.body or b""))
+            if response.status_code != 200:
+                metrics.api_error("records", response.status_code)
+                self.error.emit(f"Upload Error: {response.status_code}")
+            else:
+                utterance.mark("uploaded")
+        except Exception as e:
+            metrics.api_error("records", e)
+            self.error.emit(f"Upload Exception: {str(e)}")
+
+    def run(self):
+        while self.running:
+            item = self.queue.get()
+            if item is None:
+                continue
+            needs_translation, utterance = item
+            if needs_translation and not self.translate(utterance):
+                continue
+            self.translation_ready.emit(utterance)
+            self.upload(utterance)
+
+    def start_processing(self):
+        self.running = True
+        self.start()
+
+    def close(self):
+        """Finish the request in flight, then spool the texts still queued"""
+        self.running = False
+        self.queue.put(None)
+        self.wait()
+        while not self.queue.empty():
+            item = self.queue.get_nowait()
+            if item is not None:
+                self.spool_text(item[1])
+
 class MainWindow(QMainWindow):
     def __init__(self, audio_worker=None, transcription_worker=None):
         super().__init__()
@@ -142,6 +730,15 @@ class MainWindow(QMainWindow):
         # Initialize worker status
         self.audio_worker_active = False
         self.transcription_worker_active = False
+
+        # Worker updates are batched and applied at most UI_MAX_FPS times a second
+        self.ui_updates = UiUpdateScheduler(max_fps=int(os.getenv("UI_MAX_FPS", "30")), parent=self)
+        self.sound_active = None
+
+        # Records main-thread stalls longer than WATCHDOG_THRESHOLD_MS with a stack sample
+        self.watchdog = EventLoopWatchdog(threshold=float(os.getenv("WATCHDOG_THRESHOLD_MS", "250")) / 1000,
+                                          parent=self)
+        self.watchdog.stall_detected.connect(self.report_stall)
         
         self.init_ui()
         # Move threshold update to after UI initialization
@@ -188,6 +785,11 @@ class MainWindow(QMainWindow):
         self.sound_indicator = QLabel("Sound Level: Silent")
         self.sound_indicator.setStyleSheet("color: gray;")
         control_layout.addWidget(self.sound_indicator)
+
+        # Offline backlog waiting for the network
+        self.backlog_indicator = QLabel("Backlog: 0")
+        self.backlog_indicator.setStyleSheet("color: gray;")
+        control_layout.addWidget(self.backlog_indicator)
         
         # Threshold control
         threshold_container = QWidget()
@@ -200,27 +802,6 @@ class MainWindow(QMainWindow):
         threshold_layout.addWidget(self.threshold_slider)
         control_layout.addWidget(threshold_container)
         
-        # Set up text panels
-        transcript_container = QWidget()
-        transcript_layout = QVBoxLayout(transcript_container)
-        transcript_label = QLabel("Transcription")
-        transcript_label.setStyleSheet("font-weight: bold; font-size: 14px;")
-        self.transcript_panel = QTextEdit()
-        self.transcript_panel.setReadOnly(True)
-        self.transcript_panel.setFrameStyle(QFrame.Shape.Panel | QFrame.Shadow.Sunken)
-        transcript_layout.addWidget(transcript_label)
-        transcript_layout.addWidget(self.transcript_panel)
-        
-        translation_container = QWidget()
-        translation_layout = QVBoxLayout(translation_container)
-        translation_label = QLabel("Translation")
-        translation_label.setStyleSheet("font-weight: bold; font-size: 14px;")
-        self.translation_panel = QTextEdit()
-        self.translation_panel.setReadOnly(True)
-        self.translation_panel.setFrameStyle(QFrame.Shape.Panel | QFrame.Shadow.Sunken)
-        translation_layout.addWidget(translation_label)
-        translation_layout.addWidget(self.translation_panel)
-        
         # Status panel
         self.status_container = QWidget()
         status_layout = QVBoxLayout(self.status_container)
@@ -237,19 +818,15 @@ class MainWindow(QMainWindow):
         header_layout.addWidget(self.status_label)
         header_layout.addWidget(self.minimize_btn)
         
-        self.status_text = QTextEdit()
+        # Fixed-size ring: the oldest lines are dropped once STATUS_LINES is reached
+        self.status_text = QPlainTextEdit()
         self.status_text.setReadOnly(True)
+        self.status_text.setMaximumBlockCount(int(os.getenv("STATUS_LINES", "500")))
         self.status_text.setMaximumHeight(100)
         
         status_layout.addWidget(status_header)
         status_layout.addWidget(self.status_text)
         
-        # Initial layout setup
-        self.grid_layout.addWidget(self.control_panel, 0, 0, 1, 2)
-        self.transcript_container = transcript_container
-        self.translation_container = translation_container
-        self.update_layout()
-
         # Style the main window
         self.setStyleSheet("""
             QMainWindow {
@@ -262,7 +839,7 @@ class MainWindow(QMainWindow):
             QSplitter::handle:hover {
                 background-color: #999999;
             }
-            QTextEdit {
+            QTextEdit, QPlainTextEdit {
                 border: 1px solid #cccccc;
                 border-radius: 4px;
                 padding: 5px;
@@ -284,34 +861,27 @@ class MainWindow(QMainWindow):
         top_splitter = QSplitter(Qt.Orientation.Horizontal)
         top_splitter.setHandleWidth(8)
         
-        # Set up text panels with borders and padding
+        # Paired transcription / translation rows in one bounded, lazily laid out view
         transcript_container = QWidget()
         transcript_container.setObjectName("panel")
         transcript_layout = QVBoxLayout(transcript_container)
         transcript_layout.setContentsMargins(10, 10, 10, 10)
-        transcript_label = QLabel("Transcription")
-        transcript_label.setStyleSheet("font-weight: bold; font-size: 14px; color: #333;")
-        self.transcript_panel = QTextEdit()
-        self.transcript_panel.setFrameStyle(QFrame.Shape.Panel | QFrame.Shadow.Sunken)
-        transcript_layout.addWidget(transcript_label)
-        transcript_layout.addWidget(self.transcript_panel)
+        header = QWidget()
+        header_layout = QHBoxLayout(header)
+        header_layout.setContentsMargins(0, 0, 0, 0)
+        for title in ("Transcription", "Translation"):
+            label = QLabel(title)
+            label.setStyleSheet("font-weight: bold; font-size: 14px; color: #333;")
+            header_layout.addWidget(label, 1)
+        self.transcript_model = TranscriptModel(max_rows=int(os.getenv("SCROLLBACK_ROWS", "1000")))
+        self.transcript_view = TranscriptView(self.transcript_model)
+        self.transcript_view.setFrameStyle(QFrame.Shape.Panel | QFrame.Shadow.Sunken)
+        transcript_layout.addWidget(header)
+        transcript_layout.addWidget(self.transcript_view)
         
-        translation_container = QWidget()
-        translation_container.setObjectName("panel")
-        translation_layout = QVBoxLayout(translation_container)
-        translation_layout.setContentsMargins(10, 10, 10, 10)
-        translation_label = QLabel("Translation")
-        translation_label.setStyleSheet("font-weight: bold; font-size: 14px; color: #333;")
-        self.translation_panel = QTextEdit()
-        self.translation_panel.setFrameStyle(QFrame.Shape.Panel | QFrame.Shadow.Sunken)
-        translation_layout.addWidget(translation_label)
-        translation_layout.addWidget(self.translation_panel)
-        
-        # Add panels to top splitter
+        # Add panel to top splitter
         top_splitter.addWidget(transcript_container)
-        top_splitter.addWidget(translation_container)
         top_splitter.setStretchFactor(0, 1)
-        top_splitter.setStretchFactor(1, 1)
         
         # Status panel with border
         self.status_container.setObjectName("panel")
@@ -324,26 +894,7 @@ class MainWindow(QMainWindow):
         self.main_splitter.setStretchFactor(0, 4)  # Top section gets more space
         self.main_splitter.setStretchFactor(1, 1)  # Status gets less space
         
-        # Update layout method
-        def update_layout(self):
-            try:
-                # Clear existing layout
-                for i in reversed(range(self.grid_layout.count())):
-                    self.grid_layout.itemAt(i).widget().setParent(None)
-                
-                # Add control panel and splitters
-                self.grid_layout.addWidget(self.control_panel, 0, 0)
-                self.grid_layout.addWidget(self.main_splitter, 1, 0)
-                
-                # Save splitter states
-                self.settings.setValue("splitter_state", self.main_splitter.saveState())
-                
-            except Exception as e:
-                print(f"Layout update error: {e}")
-                self.append_status(f"Layout update error: {e}")
-        
         # Set sizes for splitters
-        top_splitter.setSizes([self.width() // 2, self.width() // 2])
         self.main_splitter.setSizes([int(self.height() * 0.8), int(self.height() * 0.2)])
         
         # Add to main layout
@@ -353,7 +904,6 @@ class MainWindow(QMainWindow):
         # Store references
         self.top_splitter = top_splitter
         self.transcript_container = transcript_container
-        self.translation_container = translation_container
 
     def toggle_status(self):
         """Toggle the visibility of the status text panel"""
@@ -366,37 +916,11 @@ class MainWindow(QMainWindow):
                 self.status_text.show()
                 self.minimize_btn.setText("_")
                 self.status_container.setMaximumHeight(150)
-            print("Status panel visibility toggled")
-
-    def update_layout(self):
-        """Update the layout based on window size"""
-        try:
-            # Remove widgets from grid (except control panel)
-            for i in reversed(range(self.grid_layout.count())):
-                item = self.grid_layout.itemAt(i)
-                if item and item.widget() != self.grid_layout.itemAt(0).widget():
-                    self.grid_layout.removeItem(item)
-
-            # Check window width for layout decision
-            if self.width() < 800:  # Vertical layout
-                self.grid_layout.addWidget(self.transcript_container, 1, 0, 1, 2)
-                self.grid_layout.addWidget(self.translation_container, 2, 0, 1, 2)
-                self.grid_layout.addWidget(self.status_container, 3, 0, 1, 2)
-            else:  # Horizontal layout
-                splitter = QSplitter(Qt.Orientation.Horizontal)
-                splitter.addWidget(self.transcript_container)
-                splitter.addWidget(self.translation_container)
-                self.grid_layout.addWidget(splitter, 1, 0, 1, 2)
-                self.grid_layout.addWidget(self.status_container, 2, 0, 1, 2)
-
-            print("Layout updated successfully")
-        except Exception as e:
-            print(f"Layout update error: {e}")
+            log.debug("Status panel visibility toggled")
 
     def resizeEvent(self, event):
         """Handle window resize events"""
         super().resizeEvent(event)
-        # No need to call update_layout anymore
         if hasattr(self, 'main_splitter'):
             self.main_splitter.refresh()
 
@@ -404,14 +928,14 @@ class MainWindow(QMainWindow):
         if hasattr(self, 'threshold_slider') and self.audio_worker:
             value = self.threshold_slider.value() / 1000.0
             self.audio_worker.threshold = value
-            print(f"Threshold updated to: {value}")
             self.append_status(f"Threshold updated to: {value}")
 
     def toggle_recording(self):
-        print("Toggle recording called")
+        log.debug("Toggle recording called")
+        toggle_start = time.perf_counter()
         try:
             if not self.running:
-                print("Starting recording...")
+                log.debug("Starting recording...")
                 if self.audio_worker and not self.audio_worker_active:
                     self.audio_worker.start_recording()
                     self.audio_worker_active = True
@@ -433,14 +957,19 @@ class MainWindow(QMainWindow):
                 """)
                 self.append_status("Service started...")
             else:
-                print("Stopping recording...")
+                log.debug("Stopping recording...")
                 if self.audio_worker and self.audio_worker_active:
                     self.audio_worker.stop()
                     self.audio_worker_active = False
+                    self.append_status(self.audio_worker.speculation_summary())
+                    self.append_status(self.audio_worker.capture.summary())
 
                 if self.transcription_worker and self.transcription_worker_active:
                     self.transcription_worker.stop()
                     self.transcription_worker_active = False
+                    self.append_status(f"Coalescing saved {self.transcription_worker.requests_saved} requests")
+                self.append_status(self.ui_updates.stall_summary())
+                self.append_status(self.watchdog.summary())
 
                 self.running = False
                 self.start_stop_btn.setText("Start")
@@ -455,21 +984,58 @@ class MainWindow(QMainWindow):
                 """)
                 self.append_status("Service stopped...")
         except Exception as e:
-            print(f"Toggle recording error: {e}")
+            log.debug("Toggle recording error", exc_info=True)
             self.append_status(f"Error: {str(e)}")
+        # Workers start and stop in the background; this should stay well under 100 ms
+        log.debug("Toggle took %.1f ms", (time.perf_counter() - toggle_start) * 1000)
 
     def append_status(self, text):
+        status_log.info(text)
+
+    def show_status(self, line):
+        """Status sink for the logging layer; see app_logging.StatusLogHandler"""
         if hasattr(self, 'status_text'):
-            self.status_text.append(text)
+            self.ui_updates.post(self.status_text.appendPlainText, line)
+
+    def report_stall(self, seconds, location):
+        self.append_status(f"UI stalled {seconds * 1000:.0f} ms in {location} "
+                           f"({self.watchdog.stalls} stalls so far)")
+
+    def update_backlog(self, audio_count, text_count):
+        self.ui_updates.post(self.apply_backlog, audio_count, text_count, key="backlog")
+
+    def apply_backlog(self, audio_count, text_count):
+        total = audio_count + text_count
+        self.backlog_indicator.setText(f"Backlog: {audio_count} audio, {text_count} text" if total else "Backlog: 0")
+        self.backlog_indicator.setStyleSheet("color: orange;" if total else "color: gray;")
+
+    def show_partial_text(self, text):
+        """Show interim text in gray until the final transcript replaces it"""
+        self.ui_updates.post(self.transcript_model.set_partial, text, key="partial")
+
+    def show_final_text(self, utterance):
+        self.ui_updates.post(self.transcript_model.set_final, utterance.seq, utterance.text)
+
+    def show_translation(self, utterance):
+        self.ui_updates.post(self.transcript_model.set_translation, utterance.seq, utterance.text,
+                             utterance.translation)
 
     def update_sound_level(self, level):
         if hasattr(self, 'sound_indicator'):
-            if self.audio_worker and level > self.audio_worker.threshold:
-                self.sound_indicator.setText("Sound Level: Active")
-                self.sound_indicator.setStyleSheet("color: green;")
-            else:
-                self.sound_indicator.setText("Sound Level: Silent")
-                self.sound_indicator.setStyleSheet("color: gray;")
+            self.ui_updates.post(self.apply_sound_level, level, key="level")
+
+    def apply_sound_level(self, level):
+        active = bool(self.audio_worker and level > self.audio_worker.threshold)
+        # setStyleSheet re-polishes the widget, so only touch it when the state flips
+        if active == self.sound_active:
+            return
+        self.sound_active = active
+        if active:
+            self.sound_indicator.setText("Sound Level: Active")
+            self.sound_indicator.setStyleSheet("color: green;")
+        else:
+            self.sound_indicator.setText("Sound Level: Silent")
+            self.sound_indicator.setStyleSheet("color: gray;")
 
     def closeEvent(self, event):
         self.running = False
@@ -485,97 +1051,203 @@ class RealtimeTranscriber:
             self.app = QApplication(sys.argv)
             load_dotenv()
 
+            # Logging goes through a queue to a rotating file, the console and the status area
+            self.status_handler = StatusLogHandler()
+            self.log_listener = setup_logging(self.status_handler)
+
             self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-            self.deeplx_api = os.getenv("deeplx_api_key")
+            # TRANSCRIPTION_BACKEND=local runs Whisper on the CPU instead of Groq
+            self.backend = create_backend(client=self.client)
+            # TRANSLATION_BACKEND: deeplx (default), local, or auto (DeepLX with local fallback)
+            self.translator = create_translator()
             
-            print("Initializing workers...")
+            log.debug("Initializing workers...")
             self.audio_worker = AudioWorker()  # Correct initialization
-            self.transcription_worker = TranscriptionWorker(self.client)
+            # PIPELINE=async runs transcription, translation and upload as asyncio stages
+            # with PIPELINE_CONCURRENCY requests in flight and PIPELINE_QUEUE items queued per stage
+            self.pipeline = None
+            self.translation_worker = None
+            if os.getenv("PIPELINE", "qthread") == "async":
+                self.pipeline = AsyncPipeline(self.backend, self.translator, UPLOAD_URL,
+                                              queue_size=int(os.getenv("PIPELINE_QUEUE", "8")),
+                                              concurrency=int(os.getenv("PIPELINE_CONCURRENCY", "4")))
+                self.transcription_worker = self.pipeline
+            else:
+                self.transcription_worker = TranscriptionWorker(self.backend)
+
+            # Segments and translations that fail are kept on disk and replayed later
+            self.spool = OfflineSpool()
+            self.transcription_worker.spool = self.spool
+            self.spool_worker = SpoolWorker(self.spool, self.backend, self.translator,
+                                            concurrency=int(os.getenv("SPOOL_CONCURRENCY", "2")))
+            if self.pipeline is None:
+                self.translation_worker = TranslationWorker(self.translator, self.spool)
+
+            # Every utterance is kept in a local searchable SQLite history (HISTORY=0 disables)
+            self.history = HistoryStore() if os.getenv("HISTORY", "1") != "0" else None
+            # Captured audio is archived for re-transcription later (ARCHIVE_AUDIO=0 disables)
+            self.archive = None
+            if os.getenv("ARCHIVE_AUDIO", "1") != "0":
+                session_id = self.history.session_id if self.history else time.strftime("%Y%m%d-%H%M%S")
+                self.archive = AudioArchiveWriter(session_id)
+                self.audio_worker.archive = self.archive
+
+            # Interim results: INTERIM_RESULTS=0 disables, INTERIM_INTERVAL sets seconds
+            interim_interval = float(os.getenv("INTERIM_INTERVAL", "1.0"))
+            self.audio_worker.interim_enabled = os.getenv("INTERIM_RESULTS", "1") != "0"
+            self.audio_worker.INTERIM_INTERVAL = interim_interval
+            self.transcription_worker.PARTIAL_MIN_INTERVAL = interim_interval
+            # Speculative dispatch: SPECULATIVE_DISPATCH=0 disables, SPECULATIVE_PAUSE sets seconds;
+            # SILENCE_THRESHOLD is the pause in seconds that ends a sentence
+            self.audio_worker.speculation_enabled = os.getenv("SPECULATIVE_DISPATCH", "1") != "0"
+            self.audio_worker.SPECULATIVE_PAUSE = float(os.getenv("SPECULATIVE_PAUSE", "0.2"))
+            self.audio_worker.SILENCE_THRESHOLD = float(os.getenv("SILENCE_THRESHOLD", "1.0"))
+            # SPEEDUP=1.2 compresses segments to 1/1.2 of their length before upload
+            self.audio_worker.SPEEDUP = float(os.getenv("SPEEDUP", "1.0"))
+            # Trimming, speed-up, encoding and archive downmix run in PREPROCESS_WORKERS
+            # processes (0 = in-thread) reading from a RING_SECONDS shared-memory ring
+            self.audio_worker.RING_SECONDS = float(os.getenv("RING_SECONDS", "60"))
+            self.audio_worker.PREPROCESS_WORKERS = int(os.getenv("PREPROCESS_WORKERS", "2"))
+            self.audio_worker.open()
+            # Capture gaps longer than CAPTURE_GAP_MS are counted; MARK_CAPTURE_GAPS=0 stops tagging utterances
+            self.audio_worker.capture.tolerance = float(os.getenv("CAPTURE_GAP_MS", "30")) / 1000
+            self.audio_worker.mark_gaps = os.getenv("MARK_CAPTURE_GAPS", "1") != "0"
+            # COALESCE_SEGMENTS=0 sends every short utterance as its own request
+            self.transcription_worker.coalesce_enabled = os.getenv("COALESCE_SEGMENTS", "1") != "0"
             
-            print("Creating main window...")
+            log.debug("Creating main window...")
             self.window = MainWindow(
                 audio_worker=self.audio_worker,
                 transcription_worker=self.transcription_worker
             )
             
-            print("Setting up connections...")
+            log.debug("Setting up connections...")
             self.setup_connections()
-            print("Initialization complete")
+            self.setup_metrics()
+            log.debug("Initialization complete")
             
         except Exception as e:
-            print(f"Initialization error: {e}")
+            log.exception("Initialization error: %s", e)
             raise
 
     def setup_connections(self):
         try:
             self.audio_worker.audio_ready.connect(self.transcription_worker.process_audio)
+            self.audio_worker.partial_audio_ready.connect(self.transcription_worker.process_partial)
+            self.audio_worker.speculative_audio_ready.connect(self.transcription_worker.process_speculative)
+            self.audio_worker.speculation_confirmed.connect(self.transcription_worker.confirm_speculative)
+            self.audio_worker.speculation_cancelled.connect(self.transcription_worker.cancel_speculative)
+            self.status_handler.message.connect(self.window.show_status)
             self.audio_worker.error.connect(self.window.append_status)
             self.audio_worker.sound_level.connect(self.window.update_sound_level)
-            self.transcription_worker.text_ready.connect(self.window.transcript_panel.append)
-            self.transcription_worker.text_ready.connect(self.translate_text)
+            self.transcription_worker.text_ready.connect(self.window.show_final_text)
+            self.transcription_worker.partial_text_ready.connect(self.window.show_partial_text)
             self.transcription_worker.error.connect(self.window.append_status)
-            print("All signals connected successfully")
+            self.spool_worker.text_ready.connect(self.window.show_final_text)
+            if self.pipeline is not None:
+                # The pipeline translates and uploads on its own loop
+                self.pipeline.translation_ready.connect(self.record_translation)
+                self.spool_worker.text_ready.connect(self.pipeline.process_text)
+                self.spool_worker.translation_ready.connect(self.pipeline.process_translation)
+            else:
+                self.translation_worker.translation_ready.connect(self.record_translation)
+                self.translation_worker.error.connect(self.window.append_status)
+                self.transcription_worker.text_ready.connect(self.translation_worker.translate_text)
+                self.spool_worker.text_ready.connect(self.translation_worker.translate_text)
+                self.spool_worker.translation_ready.connect(self.translation_worker.publish)
+            self.spool_worker.backlog_changed.connect(self.window.update_backlog)
+            log.debug("All signals connected successfully")
         except Exception as e:
-            print(f"Error setting up connections: {e}")
+            log.exception("Error setting up connections: %s", e)
             raise
 
-    def translate_text(self, text):
-        max_retries = 2
-        retry_delay = 0.2  # seconds
-        
-        for attempt in range(max_retries):
-            try:
-                url = f"https://api.deeplx.org/{self.deeplx_api}/translate"
-                data = {"text": text, "target_lang": "ZH"}
-                
-                response = requests.post(
-                    url, 
-                    json=data,
-                    headers={"Content-Type": "application/json"}
-                )
-                
-                if response.status_code == 200:
-                    translation = response.json()['data']
-                    self.window.translation_panel.append(translation)
-                    
-                    # Upload transcription and translation texts
-                    upload_url = 'https://https-dbs.vercel.app/api/addRecord'
-                    payload = {
-                        "original_text": text,
-                        "translated_text": translation
-                    }
-                    try:
-                        upload_response = requests.post(upload_url, json=payload)
-                        if upload_response.status_code != 200:
-                            self.window.append_status(f"Upload Error: {upload_response.status_code}")
-                    except Exception as ex:
-                        self.window.append_status(f"Upload Exception: {str(ex)}")
-                    
-                    break  # Success, exit retry loop
-                else:
-                    error_msg = f"Translation Error: {response.status_code}"
-                    if attempt < max_retries - 1:
-                        self.window.append_status(f"{error_msg}, retrying...")
-                        time.sleep(retry_delay)
-                    else:
-                        self.window.append_status(f"{error_msg}, all retries failed")
-                    
-            except Exception as e:
-                error_msg = f"Translation Error: {str(e)}"
-                if attempt < max_retries - 1:
-                    self.window.append_status(f"{error_msg}, retrying...")
-                    time.sleep(retry_delay)
-                else:
-                    self.window.append_status(f"{error_msg}, all retries failed")
+    def setup_metrics(self):
+        """Queue depths, cache and capture totals are read when /metrics is scraped"""
+        track = metrics.queue_depth.track
+        track(lambda: self.audio_worker.blocks.qsize(), "segmenter")
+        track(lambda: len(self.audio_worker.deliveries), "preprocess")
+        if self.pipeline is not None:
+            track(self.pipeline.transcribe_queue.qsize, "transcription")
+            track(self.pipeline.translate_queue.qsize, "translation")
+            track(self.pipeline.upload_queue.qsize, "upload")
+        else:
+            track(self.transcription_worker.transcribe_queue.qsize, "transcription")
+            track(self.translation_worker.queue.qsize, "translation")
+        track(lambda: self.spool.counts()[0], "spool_audio")
+        track(lambda: self.spool.counts()[1], "spool_text")
+        if self.history is not None:
+            track(self.history.writes.qsize, "history")
+        if self.archive is not None:
+            track(self.archive.records.qsize, "archive")
+        cache = getattr(self.backend, "cache", None)
+        if cache is not None:
+            metrics.cache_requests.track(lambda: cache.hits, "hit")
+            metrics.cache_requests.track(lambda: cache.misses, "miss")
+            metrics.cache_hit_ratio.track(cache.hit_rate)
+        capture = self.audio_worker.capture
+        metrics.audio_seconds.track(lambda: capture.captured_frames / capture.rate, "captured")
+        metrics.audio_seconds.track(lambda: capture.lost_frames / capture.rate, "lost")
+
+    def record_translation(self, utterance):
+        self.window.show_translation(utterance)
+        if self.history is not None:
+            # Latency is from the end of speech to the translation being shown
+            self.history.add(utterance.text, utterance.translation, utterance.latency("translated"),
+                             utterance.capture_start, utterance.capture_end)
 
     def start(self):
         self.window.show()
-        return self.app.exec()
+        # METRICS_PORT serves Prometheus metrics on localhost (METRICS_HOST to change)
+        self.metrics_server = None
+        if os.getenv("METRICS_PORT"):
+            self.metrics_server = metrics.serve(int(os.getenv("METRICS_PORT")),
+                                                os.getenv("METRICS_HOST", "127.0.0.1"))
+        self.spool_worker.start_draining()
+        if self.translation_worker is not None:
+            self.translation_worker.start_processing()
+        if self.history is not None:
+            self.history.start_session()
+        if self.archive is not None:
+            self.archive.start()
+        if os.getenv("WATCHDOG", "1") != "0":
+            self.window.watchdog.start()
+        try:
+            return self.app.exec()
+        finally:
+            self.window.watchdog.stop()
+            if self.metrics_server is not None:
+                self.metrics_server.shutdown()
+            self.audio_worker.close()
+            # Segments the preprocessing workers finished arrive as queued signals
+            self.app.processEvents()
+            if self.pipeline is not None:
+                self.pipeline.close()
+            else:
+                self.transcription_worker.close()
+            # Translate or record what the transcription side finished; the rest was spooled
+            self.app.processEvents()
+            self.spool_worker.stop()
+            if self.translation_worker is not None:
+                # Hand over texts the spool replayed, then record what was translated
+                self.app.processEvents()
+                self.translation_worker.close()
+                self.app.processEvents()
+            # Only now that no more rows can arrive is the scrollback page file deleted
+            self.window.ui_updates.flush()
+            self.window.transcript_model.close()
+            self.backend.close()
+            self.translator.close()
+            if self.history is not None:
+                self.history.close()
+            if self.archive is not None:
+                self.archive.close()
+            self.log_listener.stop()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Local backend worker processes in the frozen exe
     try:
         transcriber = RealtimeTranscriber()
         sys.exit(transcriber.start())
     except Exception as e:
-        print(f"Application error: {e}")
+        log.exception("Application error: %s", e)
         sys.exit(1)
\ No newline at end of file
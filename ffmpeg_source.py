@@ -0,0 +1,79 @@
+import queue
+import shutil
+import threading
+import subprocess
+from collections import deque
+
+import numpy as np
+
+MEDIA_EXTENSIONS = (".mp3", ".mp4", ".mkv", ".m4a", ".aac", ".flac", ".ogg", ".opus",
+                    ".webm", ".mov", ".avi", ".wma")
+
+
+def ffmpeg_available():
+    return shutil.which("ffmpeg") is not None
+
+
+def ffmpeg_blocks(path, block_seconds=0.1, rate=16000, max_queued=50):
+    """Decode any audio or video file to 16 kHz mono int16 blocks through an ffmpeg pipe.
+
+    A reader thread pulls fixed-size blocks off the pipe into a queue of at
+    most max_queued blocks, so ffmpeg is throttled by the consumer and
+    nothing is written to disk. Errors keep only the last lines of stderr.
+    """
+    if not ffmpeg_available():
+        raise RuntimeError("ffmpeg not found on PATH")
+    command = ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", path,
+               "-vn", "-ac", "1", "-ar", str(rate), "-f", "s16le", "pipe:1"]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    block_bytes = int(rate * block_seconds) * 2
+    blocks = queue.Queue(maxsize=max_queued)
+    stop = threading.Event()
+
+    def read_pipe():
+        try:
+            while not stop.is_set():
+                data = process.stdout.read(block_bytes)
+                if not data:
+                    break
+                blocks.put(data)
+        finally:
+            blocks.put(None)
+
+    # Drained on its own so a flood of decode errors can't fill the pipe and stall ffmpeg
+    errors = deque(maxlen=20)
+
+    def read_errors():
+        for line in process.stderr:
+            errors.append(line.decode(errors="replace").rstrip())
+
+    reader = threading.Thread(target=read_pipe, daemon=True)
+    reader.start()
+    error_reader = threading.Thread(target=read_errors, daemon=True)
+    error_reader.start()
+    try:
+        while True:
+            data = blocks.get()
+            if data is None:
+                break
+            # An odd trailing byte can only come from a truncated stream
+            yield np.frombuffer(data[:len(data) - len(data) % 2], dtype=np.int16)
+        process.wait()
+        if process.returncode != 0:
+            error_reader.join()
+            message = "\n".join(errors).strip()
+            raise RuntimeError(f"ffmpeg failed on {path}: {message}")
+    finally:
+        # Consumer stopped early or failed: unblock the reader and end ffmpeg
+        stop.set()
+        if process.poll() is None:
+            process.kill()
+        while reader.is_alive():
+            try:
+                blocks.get_nowait()
+            except queue.Empty:
+                reader.join(0.1)
+        process.stdout.close()
+        process.wait()
+        error_reader.join()
+        process.stderr.close()
@@ -1,17 +1,15 @@
 import os
-from groq import Groq
+import sys
 from dotenv import load_dotenv
+from transcription_backends import create_backend
+from long_audio import transcribe_file
 
 load_dotenv()  # Load environment variables
 
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-filename = os.path.dirname(__file__) + "/output.wav"
+# Repeated runs on the same recording are served from the transcription cache
+backend = create_backend()
+filename = sys.argv[1] if len(sys.argv) > 1 else os.path.dirname(__file__) + "/output.wav"
 
-with open(filename, "rb") as file:
-    transcription = client.audio.transcriptions.create(
-      file=(filename, file.read()),
-      model="whisper-large-v3-turbo",
-      response_format="verbose_json",
-    )
-    print(transcription.text)
-      
\ No newline at end of file
+# Streamed from disk and split at silences, so long recordings fit the API limits
+transcription = transcribe_file(filename, backend)
+print(transcription["text"])
@@ -0,0 +1,223 @@
+import os
+import csv
+import json
+import time
+import uuid
+import queue
+import sqlite3
+import logging
+import argparse
+import threading
+
+DEFAULT_HISTORY_DB = os.path.join(os.path.expanduser("~"), ".cache", "listen-write-translate", "history.sqlite3")
+EXPORT_FIELDS = ["id", "session_id", "created", "capture_start", "capture_end", "source", "translation", "latency"]
+
+log = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    started REAL NOT NULL,
+    ended REAL
+);
+CREATE TABLE IF NOT EXISTS utterances (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    created REAL NOT NULL,
+    capture_start REAL,
+    capture_end REAL,
+    source TEXT NOT NULL,
+    translation TEXT,
+    latency REAL
+);
+CREATE INDEX IF NOT EXISTS utterances_created ON utterances (created);
+CREATE INDEX IF NOT EXISTS utterances_session ON utterances (session_id, created);
+"""
+
+# External-content FTS index kept in sync by triggers. The trigram tokenizer
+# matches substrings, which also works for Chinese text without spaces.
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS utterances_fts USING fts5(
+    source, translation, content='utterances', content_rowid='id', tokenize='{tokenizer}'
+);
+CREATE TRIGGER IF NOT EXISTS utterances_ai AFTER INSERT ON utterances BEGIN
+    INSERT INTO utterances_fts (rowid, source, translation) VALUES (new.id, new.source, new.translation);
+END;
+CREATE TRIGGER IF NOT EXISTS utterances_ad AFTER DELETE ON utterances BEGIN
+    INSERT INTO utterances_fts (utterances_fts, rowid, source, translation)
+    VALUES ('delete', old.id, old.source, old.translation);
+END;
+CREATE TRIGGER IF NOT EXISTS utterances_au AFTER UPDATE ON utterances BEGIN
+    INSERT INTO utterances_fts (utterances_fts, rowid, source, translation)
+    VALUES ('delete', old.id, old.source, old.translation);
+    INSERT INTO utterances_fts (rowid, source, translation) VALUES (new.id, new.source, new.translation);
+END;
+"""
+
+
+def connect(path):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class HistoryStore:
+    """Local SQLite history of every utterance with a full-text index.
+
+    Writes go through a queue to one writer thread that commits in batches,
+    so recording an utterance never waits on disk. Reads use their own
+    connection; with WAL they don't block the writer.
+    """
+
+    def __init__(self, path=None, session_id=None):
+        self.path = path or os.getenv("HISTORY_DB", DEFAULT_HISTORY_DB)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.session_id = session_id or time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+        self.conn = connect(self.path)
+        self.conn.executescript(SCHEMA)
+        self.fts = self.create_fts()
+        self.reader = connect(self.path)
+        self.read_lock = threading.Lock()
+        self.writes = queue.Queue()
+        self.writer = None
+
+    def create_fts(self):
+        for tokenizer in ("trigram", "unicode61"):
+            try:
+                self.conn.executescript(FTS_SCHEMA.format(tokenizer=tokenizer))
+                break
+            except sqlite3.OperationalError as e:
+                log.info("FTS5 tokenizer %s unavailable: %s", tokenizer, e)
+        else:
+            return None  # No FTS5 in this SQLite build; search falls back to LIKE
+        # An existing database keeps the tokenizer it was created with
+        sql = self.conn.execute("SELECT sql FROM sqlite_master WHERE name = 'utterances_fts'").fetchone()[0]
+        return "trigram" if "trigram" in sql else "unicode61"
+
+    def start_session(self):
+        self.writer = threading.Thread(target=self.write_loop, daemon=True)
+        self.writer.start()
+        self.writes.put(("INSERT OR IGNORE INTO sessions (id, started) VALUES (?, ?)",
+                         (self.session_id, time.time())))
+
+    def add(self, source, translation=None, latency=None, capture_start=None, capture_end=None, created=None):
+        self.writes.put((
+            "INSERT INTO utterances (session_id, created, capture_start, capture_end, source, translation, latency)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self.session_id, created or time.time(), capture_start, capture_end, source, translation, latency)))
+
+    def write_loop(self):
+        while True:
+            batch = [self.writes.get()]
+            # Commit whatever else is already queued in the same transaction
+            while True:
+                try:
+                    batch.append(self.writes.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            try:
+                with self.conn:
+                    for item in batch:
+                        if item is not None:
+                            self.conn.execute(*item)
+            except Exception as e:
+                log.exception("History write failed: %s", e)
+            if stop:
+                return
+
+    def close(self):
+        if self.writer is not None:
+            self.writes.put(("UPDATE sessions SET ended = ? WHERE id = ?", (time.time(), self.session_id)))
+            self.writes.put(None)
+            self.writer.join()
+            self.writer = None
+        self.reader.close()
+        self.conn.close()
+
+    def match_expression(self, query):
+        """Quote each term so user input can't be parsed as FTS syntax; terms are ANDed"""
+        return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+    def search(self, query=None, since=None, until=None, session_id=None, limit=100):
+        """Newest first utterances matching all terms of `query`, as dicts"""
+        where = []
+        args = []
+        terms = query.split() if query else []
+        # Trigram FTS needs at least three characters per term
+        if terms and self.fts and all(len(term) >= 3 or self.fts != "trigram" for term in terms):
+            where.append("u.id IN (SELECT rowid FROM utterances_fts WHERE utterances_fts MATCH ?)")
+            args.append(self.match_expression(query))
+        else:
+            for term in terms:
+                where.append("(u.source LIKE ? OR u.translation LIKE ?)")
+                args += [f"%{term}%"] * 2
+        if since is not None:
+            where.append("u.created >= ?")
+            args.append(since)
+        if until is not None:
+            where.append("u.created < ?")
+            args.append(until)
+        if session_id is not None:
+            where.append("u.session_id = ?")
+            args.append(session_id)
+        sql = "SELECT u.* FROM utterances u"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY u.created DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with self.read_lock:
+            return [dict(row) for row in self.reader.execute(sql, args)]
+
+    def export(self, path, **filters):
+        """Write matching utterances oldest first to .csv or .jsonl; returns the count"""
+        rows = self.search(limit=filters.pop("limit", None), **filters)
+        rows.reverse()
+        with open(path, "w", encoding="utf-8", newline="") as file:
+            if path.lower().endswith(".csv"):
+                writer = csv.DictWriter(file, EXPORT_FIELDS, extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(rows)
+            else:
+                for row in rows:
+                    file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        return len(rows)
+
+
+def parse_date(value):
+    return time.mktime(time.strptime(value, "%Y-%m-%d")) if value else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search or export the local transcription history")
+    parser.add_argument("command", choices=["search", "export"])
+    parser.add_argument("query", nargs="?", default=None)
+    parser.add_argument("-o", "--output", help="export file (.csv or .jsonl)")
+    parser.add_argument("--since", help="YYYY-MM-DD")
+    parser.add_argument("--until", help="YYYY-MM-DD")
+    parser.add_argument("--session")
+    parser.add_argument("-n", "--limit", type=int, default=50)
+    parser.add_argument("--db", default=None)
+    args = parser.parse_args()
+
+    store = HistoryStore(args.db)
+    filters = dict(query=args.query, since=parse_date(args.since), until=parse_date(args.until),
+                   session_id=args.session)
+    start = time.perf_counter()
+    if args.command == "export":
+        if not args.output:
+            parser.error("export needs --output")
+        count = store.export(args.output, **filters)
+        print(f"Exported {count} utterances to {args.output} in {time.perf_counter() - start:.2f}s")
+    else:
+        rows = store.search(limit=args.limit, **filters)
+        for row in rows:
+            stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row["created"]))
+            print(f"{stamp} [{row['session_id']}] {row['source']}")
+            if row["translation"]:
+                print(f"{' ' * 20}{row['translation']}")
+        print(f"{len(rows)} results in {(time.perf_counter() - start) * 1000:.1f} ms")
+    store.close()
@@ -0,0 +1,176 @@
+import sys
+import argparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+
+from wav_io import WavReader, Resampler, encode_pcm16, downmix, to_int16, to_mono_16k
+from ffmpeg_source import ffmpeg_blocks
+
+OUTPUT_RATE = 16000
+# Groq rejects uploads above 25 MB; keep some headroom
+MAX_CHUNK_BYTES = 24 * 1024 * 1024
+MAX_CHUNK_SECONDS = 600
+
+
+class SilenceChunker:
+    """Split a stream of 16 kHz mono int16 blocks into chunks at quiet points.
+
+    Once a chunk is longer than soft_ratio * max_seconds it is cut at the
+    first silent block; if no silent block arrives before max_seconds it is
+    cut at the quietest block seen since the soft limit. Only the current
+    chunk is held in memory.
+    """
+
+    def __init__(self, max_seconds=MAX_CHUNK_SECONDS, max_bytes=MAX_CHUNK_BYTES,
+                 silence_threshold=0.01, soft_ratio=0.8):
+        max_frames_by_size = (max_bytes - 44) // 2
+        self.max_frames = min(int(max_seconds * OUTPUT_RATE), max_frames_by_size)
+        self.soft_frames = int(self.max_frames * soft_ratio)
+        self.silence_threshold = silence_threshold * 32768
+        self.blocks = []
+        self.frames = 0
+        self.start_frame = 0
+        self.quietest = None  # (rms, index of block in self.blocks)
+
+    def cut(self, n_blocks):
+        chunk_blocks = self.blocks[:n_blocks]
+        self.blocks = self.blocks[n_blocks:]
+        chunk = np.concatenate(chunk_blocks) if chunk_blocks else np.zeros(0, dtype=np.int16)
+        start = self.start_frame / OUTPUT_RATE
+        self.start_frame += len(chunk)
+        self.frames -= len(chunk)
+        self.quietest = None
+        return start, chunk
+
+    def add(self, block):
+        """Add one block and return a finished (start_seconds, pcm) chunk or None"""
+        if len(block) == 0:
+            return None
+        self.blocks.append(block)
+        self.frames += len(block)
+        if self.frames < self.soft_frames:
+            return None
+
+        rms = np.sqrt(np.mean(np.square(block, dtype=np.float32)))
+        if rms < self.silence_threshold:
+            return self.cut(len(self.blocks))
+        if self.quietest is None or rms < self.quietest[0]:
+            self.quietest = (rms, len(self.blocks) - 1)
+        if self.frames >= self.max_frames:
+            return self.cut(self.quietest[1] + 1)
+        return None
+
+    def flush(self):
+        if not self.blocks:
+            return None
+        return self.cut(len(self.blocks))
+
+    def chunks(self, blocks):
+        for block in blocks:
+            chunk = self.add(block)
+            if chunk is not None:
+                yield chunk
+        chunk = self.flush()
+        if chunk is not None:
+            yield chunk
+
+
+def wav_blocks(path, block_seconds=0.1):
+    """16 kHz mono blocks from a WAV file, read through a memory map"""
+    with WavReader(path) as reader:
+        if reader.rate == OUTPUT_RATE:
+            for block in reader.iter_blocks(block_seconds):
+                yield to_mono_16k(block, reader.rate)
+            return
+        # The resampler keeps its phase and filter history across blocks
+        resampler = Resampler(reader.rate, OUTPUT_RATE)
+        for block in reader.iter_blocks(block_seconds):
+            yield to_int16(resampler.process(downmix(block)))
+        yield to_int16(resampler.flush())
+
+
+def media_blocks(path, block_seconds=0.1):
+    """16 kHz mono blocks from any input: 16-bit WAV is memory-mapped, the rest goes through ffmpeg"""
+    if path.lower().endswith(".wav"):
+        try:
+            WavReader(path).close()
+        except ValueError:
+            pass  # Not 16-bit PCM; let ffmpeg decode it
+        else:
+            return wav_blocks(path, block_seconds)
+    return ffmpeg_blocks(path, block_seconds)
+
+
+def merge_results(results):
+    """Combine per-chunk results, shifting segment timestamps by each chunk's start"""
+    segments = []
+    texts = []
+    language = None
+    duration = 0
+    for start, result in results:
+        texts.append(result["text"].strip())
+        language = language or result.get("language")
+        for segment in result["segments"]:
+            segment = dict(segment)
+            segment["start"] = segment["start"] + start
+            segment["end"] = segment["end"] + start
+            segment["id"] = len(segments)
+            segments.append(segment)
+        if segments:
+            duration = max(duration, segments[-1]["end"])
+    return {
+        "text": " ".join(text for text in texts if text),
+        "language": language,
+        "duration": duration,
+        "segments": segments,
+    }
+
+
+def transcribe_stream(blocks, backend, workers=2, chunker=None, **params):
+    """Transcribe a stream of 16 kHz mono blocks chunk by chunk.
+
+    At most `workers` chunks are encoded and in flight at once, so memory
+    stays bounded however long the input is.
+    """
+    chunker = chunker or SilenceChunker()
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight = {}
+        for start, pcm in chunker.chunks(blocks):
+            wav_bytes = encode_pcm16(pcm, OUTPUT_RATE)
+            del pcm
+            in_flight[executor.submit(backend.transcribe, wav_bytes, **params)] = start
+            del wav_bytes
+            if len(in_flight) >= workers:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results.append((in_flight.pop(future), future.result()))
+        for future in list(in_flight):
+            results.append((in_flight.pop(future), future.result()))
+    results.sort(key=lambda item: item[0])
+    return merge_results(results)
+
+
+def transcribe_file(path, backend, workers=2, **params):
+    return transcribe_stream(media_blocks(path), backend, workers=workers, **params)
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from transcription_backends import create_backend
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Transcribe a long recording in silence-aligned chunks")
+    parser.add_argument("file")
+    parser.add_argument("-j", "--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    backend = create_backend()
+    try:
+        result = transcribe_file(args.file, backend, workers=args.workers)
+    finally:
+        backend.close()
+    for segment in result["segments"]:
+        print(f"[{segment['start']:8.2f} - {segment['end']:8.2f}] {segment['text'].strip()}")
+    sys.exit(0)
@@ -0,0 +1,248 @@
+import time
+import bisect
+import logging
+import weakref
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "lwt_"
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+log = logging.getLogger(__name__)
+
+REGISTRY = []
+
+
+def format_value(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class ThreadToken:
+    """Lives in a thread's local storage; freed when the thread exits"""
+    __slots__ = ("__weakref__",)
+
+
+def add(total, value):
+    return value if total is None else total + value
+
+
+def add_lists(total, value):
+    return list(value) if total is None else [a + b for a, b in zip(total, value)]
+
+
+class ThreadCells:
+    """Per-thread dicts of cells (label values -> value) that only their own thread writes.
+
+    Updates need no lock. A thread's cells are tied to a token in its local
+    storage; once the thread exits and the token is freed, the next
+    snapshot() folds those cells into `retired`, so short-lived threads
+    don't leave entries behind for the life of the process.
+    """
+
+    def __init__(self, merge):
+        self.merge = merge  # merge(total or None, value) -> new total, never changing either in place
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.owned = []  # (weakref to the owning thread's token, cells)
+        self.retired = {}
+
+    def mine(self):
+        try:
+            return self.local.cells
+        except AttributeError:
+            token = self.local.token = ThreadToken()
+            cells = self.local.cells = {}
+            with self.lock:
+                self.owned.append((weakref.ref(token), cells))
+            return cells
+
+    def snapshot(self):
+        """Copies of the retired totals and of each live thread's cells"""
+        with self.lock:
+            live = []
+            for ref, cells in self.owned:
+                if ref() is None:
+                    for labels, value in list(cells.items()):
+                        self.retired[labels] = self.merge(self.retired.get(labels), value)
+                else:
+                    live.append((ref, cells))
+            self.owned = live
+            return [dict(self.retired)] + [dict(cells) for _, cells in live]
+
+
+class Metric:
+    """A named metric with optional labels, rendered in the Prometheus text format"""
+    kind = "untyped"
+
+    def __init__(self, name, help, labels=()):
+        self.name = PREFIX + name
+        self.help = help
+        self.labels = tuple(labels)
+        REGISTRY.append(self)
+
+    def label_text(self, values, extra=()):
+        pairs = list(zip(self.labels, values)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in pairs) + "}"
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self.samples()
+
+    def samples(self):
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Monotonic count, summed over per-thread cells.
+
+    Each thread only ever writes its own cells, so inc() takes no lock; a
+    scrape copies the cells and adds them up. Values that are already
+    counted elsewhere can be exposed with track() instead.
+    """
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self.cells = ThreadCells(add)
+        self.callbacks = {}  # label values -> function returning the value
+
+    def inc(self, *labels, amount=1):
+        cells = self.cells.mine()
+        cells[labels] = cells.get(labels, 0) + amount
+
+    def track(self, function, *labels):
+        """Read the value for these labels from function() at scrape time"""
+        self.callbacks[labels] = function
+
+    def values(self):
+        totals = {}
+        for cells in self.cells.snapshot():
+            for labels, value in cells.items():
+                totals[labels] = totals.get(labels, 0) + value
+        for labels, function in list(self.callbacks.items()):
+            try:
+                totals[labels] = function()
+            except Exception as e:
+                log.debug("Metric %s%s unavailable: %s", self.name, labels, e)
+        return totals
+
+    def samples(self):
+        return [f"{self.name}{self.label_text(labels)} {format_value(value)}"
+                for labels, value in sorted(self.values().items())]
+
+
+class Gauge(Counter):
+    """A value that goes up and down; inc() and dec() may come from different threads"""
+    kind = "gauge"
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    """Distribution of observed values in fixed buckets, kept in per-thread cells like Counter"""
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        self.cells = ThreadCells(add_lists)  # label values -> [count per bucket..., +Inf count, sum]
+
+    def observe(self, value, *labels):
+        cells = self.cells.mine()
+        cell = cells.get(labels)
+        if cell is None:
+            cell = cells[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def samples(self):
+        merged = {}
+        for cells in self.cells.snapshot():
+            for labels, cell in cells.items():
+                merged[labels] = add_lists(merged.get(labels), cell)
+        lines = []
+        for labels, total in sorted(merged.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), total[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else format_value(bound)
+                lines.append(f"{self.name}_bucket{self.label_text(labels, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{self.label_text(labels)} {format_value(total[-1])}")
+            lines.append(f"{self.name}_count{self.label_text(labels)} {cumulative}")
+        return lines
+
+
+queue_depth = Gauge("queue_depth", "Items waiting in each queue", ["queue"])
+in_flight = Gauge("requests_in_flight", "Requests or jobs currently running per stage", ["stage"])
+stage_latency = Histogram("stage_latency_seconds", "Duration of each request or job per stage", ["stage"])
+api_errors = Counter("api_errors_total", "Failed API calls by service and HTTP status or error type",
+                     ["service", "code"])
+cache_requests = Counter("cache_requests_total", "Transcription cache lookups", ["result"])
+cache_hit_ratio = Gauge("cache_hit_ratio", "Share of transcription cache lookups that were hits")
+audio_seconds = Counter("audio_seconds_total",
+                        "Audio captured, lost in capture, sent for transcription, or skipped as silence or trimmed",
+                        ["state"])
+bytes_uploaded = Counter("bytes_uploaded_total", "Request body bytes sent", ["service"])
+
+
+@contextmanager
+def timed(stage):
+    """Count a request as in flight and record its duration in stage_latency"""
+    in_flight.inc(stage)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_latency.observe(time.perf_counter() - start, stage)
+        in_flight.dec(stage)
+
+
+def api_error(service, error):
+    """Count a failed call; error is an HTTP status code or the exception raised"""
+    if isinstance(error, BaseException):
+        response = getattr(error, "response", None)
+        code = getattr(error, "status_code", None) or getattr(response, "status_code", None) or type(error).__name__
+    else:
+        code = error
+    api_errors.inc(service, str(code))
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        log.debug("Metrics request: " + format, *args)
+
+
+def serve(port, host="127.0.0.1"):
+    """Serve /metrics from a background thread; call shutdown() on the result to stop"""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    log.info("Metrics at http://%s:%d/metrics", host, server.server_address[1])
+    return server
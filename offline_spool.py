@@ -0,0 +1,221 @@
+import os
+import io
+import json
+import time
+import logging
+import zlib
+import wave
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from wav_io import encode_pcm16
+
+try:
+    import soundfile
+except ImportError:  # Fall back to zlib-compressed WAV
+    soundfile = None
+
+DEFAULT_SPOOL_DIR = os.path.join(os.path.expanduser("~"), ".cache", "listen-write-translate", "spool")
+
+# Exception class names, from the standard library, requests, httpx and groq, that mean the service is unreachable
+NETWORK_ERRORS = {"ConnectionError", "TimeoutError", "Timeout", "gaierror", "TransportError", "APIConnectionError"}
+
+# Replay results
+DONE, FAILED, OFFLINE = "done", "failed", "offline"
+
+log = logging.getLogger(__name__)
+
+
+def error_status(error):
+    """HTTP status code carried by an API or requests exception, if any"""
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_offline(error):
+    """True for failures that say nothing about the item: no network, timeouts, 5xx or rate limits"""
+    status = error_status(error)
+    if status is not None:
+        return status >= 500 or status in (408, 429)
+    return any(cls.__name__ in NETWORK_ERRORS for cls in type(error).__mro__)
+
+
+def compress_wav(wav_bytes):
+    """FLAC when soundfile is installed, otherwise zlib; returns (data, extension)"""
+    if soundfile is not None:
+        with wave.open(io.BytesIO(wav_bytes), 'rb') as wav:
+            channels, rate = wav.getnchannels(), wav.getframerate()
+            pcm = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16).reshape(-1, channels)
+        buffer = io.BytesIO()
+        soundfile.write(buffer, pcm, rate, format="FLAC", subtype="PCM_16")
+        return buffer.getvalue(), ".flac"
+    return zlib.compress(wav_bytes, 6), ".wav.z"
+
+
+def decompress_wav(data, extension):
+    if extension == ".flac":
+        pcm, rate = soundfile.read(io.BytesIO(data), dtype="int16", always_2d=True)
+        return encode_pcm16(pcm, rate)
+    return zlib.decompress(data)
+
+
+class OfflineSpool:
+    """Disk-backed queue of segment audio and texts waiting for the network.
+
+    Each item is a data file plus a JSON metadata file named by a sortable
+    id, written atomically, so the backlog survives a restart and is
+    drained oldest first. An item that is unreadable, rejected with a 4xx,
+    or fails `max_attempts` times for other reasons is moved to
+    quarantine/ so it can't hold up the rest.
+    """
+
+    def __init__(self, directory=None, max_attempts=None):
+        self.directory = directory or os.getenv("SPOOL_DIR", DEFAULT_SPOOL_DIR)
+        self.max_attempts = max_attempts or int(os.getenv("SPOOL_MAX_ATTEMPTS", "5"))
+        self.audio_dir = os.path.join(self.directory, "audio")
+        self.text_dir = os.path.join(self.directory, "text")
+        self.quarantine_dir = os.path.join(self.directory, "quarantine")
+        os.makedirs(self.audio_dir, exist_ok=True)
+        os.makedirs(self.text_dir, exist_ok=True)
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+
+    def new_id(self):
+        return f"{time.time_ns():020d}-{next(self.counter):06d}"
+
+    def write(self, path, data):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+
+    def spool_audio(self, wav_bytes, meta=None):
+        item_id = self.new_id()
+        data, extension = compress_wav(wav_bytes)
+        meta = dict(meta or {}, extension=extension, spooled_at=time.time())
+        self.write(os.path.join(self.audio_dir, item_id + extension), data)
+        # Metadata last: an item only counts once both files exist
+        self.write(os.path.join(self.audio_dir, item_id + ".json"), json.dumps(meta).encode())
+        return item_id
+
+    def spool_text(self, text, meta=None):
+        item_id = self.new_id()
+        meta = dict(meta or {}, text=text, spooled_at=time.time())
+        self.write(os.path.join(self.text_dir, item_id + ".json"),
+                   json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+        return item_id
+
+    def pending(self, directory):
+        return sorted(name[:-5] for name in os.listdir(directory) if name.endswith(".json"))
+
+    def counts(self):
+        return len(self.pending(self.audio_dir)), len(self.pending(self.text_dir))
+
+    def load_audio(self, item_id):
+        with open(os.path.join(self.audio_dir, item_id + ".json"), "r") as file:
+            meta = json.load(file)
+        with open(os.path.join(self.audio_dir, item_id + meta["extension"]), "rb") as file:
+            return decompress_wav(file.read(), meta["extension"]), meta
+
+    def load_text(self, item_id):
+        with open(os.path.join(self.text_dir, item_id + ".json"), "r", encoding="utf-8") as file:
+            meta = json.load(file)
+        return meta["text"], meta
+
+    def remove_audio(self, item_id, extension):
+        for suffix in (".json", extension):
+            try:
+                os.remove(os.path.join(self.audio_dir, item_id + suffix))
+            except OSError:
+                pass
+
+    def remove_text(self, item_id):
+        try:
+            os.remove(os.path.join(self.text_dir, item_id + ".json"))
+        except OSError:
+            pass
+
+    def item_dir(self, kind):
+        return self.audio_dir if kind == "audio" else self.text_dir
+
+    def quarantine(self, kind, item_id, reason):
+        """Move every file of an item out of the backlog"""
+        target = os.path.join(self.quarantine_dir, kind)
+        os.makedirs(target, exist_ok=True)
+        directory = self.item_dir(kind)
+        for name in os.listdir(directory):
+            if name.startswith(item_id):
+                try:
+                    os.replace(os.path.join(directory, name), os.path.join(target, name))
+                except OSError:
+                    pass
+        log.warning("Spooled %s %s quarantined in %s: %s", kind, item_id, target, reason)
+
+    def record_failure(self, kind, item_id, meta, error):
+        meta["attempts"] = meta.get("attempts", 0) + 1
+        meta["last_error"] = str(error)[:200]
+        status = error_status(error)
+        if status is not None and 400 <= status < 500:
+            self.quarantine(kind, item_id, f"rejected with {status}: {error}")
+        elif meta["attempts"] >= self.max_attempts:
+            self.quarantine(kind, item_id, f"failed {meta['attempts']} times, last: {error}")
+        else:
+            log.info("Spool replay of %s %s failed (attempt %d): %s", kind, item_id, meta["attempts"], error)
+            self.write(os.path.join(self.item_dir(kind), item_id + ".json"),
+                       json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+
+    def drain(self, handle_audio, handle_text, concurrency=2):
+        """Replay the backlog oldest first; returns True once it is empty.
+
+        Items are tried one at a time as a connectivity probe until one
+        goes through, then the rest are sent `concurrency` at a time. A
+        network or server failure during the probe ends the drain; items
+        that fail stay on disk for the next attempt unless quarantined.
+        """
+        with self.lock:
+            jobs = [("audio", item_id) for item_id in self.pending(self.audio_dir)]
+            jobs += [("text", item_id) for item_id in self.pending(self.text_dir)]
+            if not jobs:
+                return True
+            results = []
+            while jobs:
+                result = self.replay(jobs.pop(0), handle_audio, handle_text)
+                if result == OFFLINE:
+                    return False
+                results.append(result)
+                if result == DONE:
+                    break
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                results += executor.map(lambda job: self.replay(job, handle_audio, handle_text), jobs)
+            return all(result == DONE for result in results)
+
+    def replay(self, job, handle_audio, handle_text):
+        kind, item_id = job
+        try:
+            if kind == "audio":
+                payload, meta = self.load_audio(item_id)
+            else:
+                payload, meta = self.load_text(item_id)
+        except Exception as e:
+            self.quarantine(kind, item_id, f"unreadable: {e!r}")
+            return FAILED
+        try:
+            if kind == "audio":
+                handle_audio(payload, meta)
+            else:
+                handle_text(payload, meta)
+        except Exception as e:
+            if is_offline(e):
+                log.info("Spool replay of %s %s failed: %s", kind, item_id, e)
+                return OFFLINE
+            self.record_failure(kind, item_id, meta, e)
+            return FAILED
+        if kind == "audio":
+            self.remove_audio(item_id, meta["extension"])
+        else:
+            self.remove_text(item_id)
+        return DONE
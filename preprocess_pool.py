@@ -0,0 +1,172 @@
+import logging
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from wav_io import WavEncoder, to_mono_16k
+from audio_preprocess import TimeMap, trim_and_compress, wsola_speedup
+
+log = logging.getLogger(__name__)
+
+
+class RingOverrun(Exception):
+    """The requested frames were overwritten before they could be read"""
+
+
+class PcmRing:
+    """Ring buffer of float32 frames in multiprocessing.shared_memory.
+
+    Frames are addressed by an absolute, ever-increasing frame index; the
+    number of frames written so far is kept in the first 8 bytes of the
+    shared block so other processes can tell whether a range they are about
+    to read is still intact. There is a single writer (the capture thread).
+    """
+    HEADER = 64
+
+    def __init__(self, shm, frames, channels, owner):
+        self.shm = shm
+        self.frames = frames
+        self.channels = channels
+        self.owner = owner
+        self.counter = np.ndarray((1,), dtype=np.int64, buffer=shm.buf)
+        self.data = np.ndarray((frames, channels), dtype=np.float32, buffer=shm.buf, offset=self.HEADER)
+
+    @classmethod
+    def create(cls, frames, channels):
+        shm = shared_memory.SharedMemory(create=True, size=cls.HEADER + frames * channels * 4)
+        ring = cls(shm, frames, channels, owner=True)
+        ring.counter[0] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name, frames, channels):
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:  # Python < 3.13 has no track argument
+            shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, frames, channels, owner=False)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def written(self):
+        return int(self.counter[0])
+
+    def write(self, block):
+        """Append a (frames, channels) block; returns its absolute start index"""
+        start = self.written
+        position = start % self.frames
+        count = len(block)
+        first = min(count, self.frames - position)
+        self.data[position:position + first] = block[:first]
+        if first < count:
+            self.data[:count - first] = block[first:]
+        self.counter[0] = start + count  # Publish only after the data is in place
+        return start
+
+    def intact(self, start):
+        return start >= self.written - self.frames
+
+    def read(self, start, count):
+        """Copy of frames [start, start + count); raises RingOverrun if they were overwritten"""
+        if not self.intact(start):
+            raise RingOverrun(f"frames from {start} were overwritten")
+        position = start % self.frames
+        first = min(count, self.frames - position)
+        if first == count:
+            audio = self.data[position:position + count].copy()
+        else:
+            audio = np.concatenate([self.data[position:], self.data[:count - first]])
+        # The writer may have lapped us while copying
+        if not self.intact(start):
+            raise RingOverrun(f"frames from {start} were overwritten")
+        return audio
+
+    def close(self):
+        self.counter = None
+        self.data = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+# Per worker process state, set up by the pool initializer
+worker_ring = None
+worker_encoder = None
+
+
+def attach_worker(name, frames, channels):
+    global worker_ring, worker_encoder
+    worker_ring = PcmRing.attach(name, frames, channels)
+    worker_encoder = WavEncoder()
+
+
+def prepare_job(start, count, options):
+    """Read a segment from the ring and do the CPU-heavy work on it.
+
+    options: rate, origin (capture time of frame `start`), archive (also
+    return 16 kHz mono int16 for the archive), prepare (trim / speed up /
+    encode), trim, threshold, max_pause, keep_pause, speedup.
+    """
+    rate = options["rate"]
+    audio = worker_ring.read(start, count)
+    result = {"wav": None, "time_map": None, "archive": None}
+    if options.get("archive"):
+        result["archive"] = to_mono_16k((np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16), rate)
+    if not options.get("prepare", True):
+        return result
+    origin = options.get("origin", 0.0)
+    if options.get("trim"):
+        audio, time_map = trim_and_compress(audio, rate, threshold=options["threshold"],
+                                            max_pause=options["max_pause"], keep_pause=options["keep_pause"],
+                                            origin=origin)
+    else:
+        time_map = TimeMap.identity(len(audio) / rate, origin=origin)
+    speedup = options.get("speedup", 1.0)
+    if speedup != 1.0 and len(audio):
+        audio, time_map = wsola_speedup(audio, rate, speedup, base=time_map)
+    result["time_map"] = time_map
+    if len(audio):
+        result["wav"] = worker_encoder.encode(audio, rate).obj  # The bytearray pickles; its memoryview doesn't
+    return result
+
+
+class PreprocessPool:
+    """Runs prepare_job in worker processes attached to the same PcmRing.
+
+    With workers=0 jobs run inline in the calling thread instead, which
+    keeps the same interface for debugging and single-core machines.
+    """
+
+    def __init__(self, ring, workers=2):
+        self.ring = ring
+        self.workers = workers
+        self.executor = None
+        if workers > 0:
+            self.executor = ProcessPoolExecutor(max_workers=workers, initializer=attach_worker,
+                                                initargs=(ring.name, ring.frames, ring.channels))
+            # Start the workers now so the first segment doesn't wait for them
+            for future in [self.executor.submit(int) for _ in range(workers)]:
+                future.result()
+        else:
+            self.encoder = WavEncoder()
+
+    def submit(self, start, count, options):
+        if self.executor is not None:
+            return self.executor.submit(prepare_job, start, count, options)
+        global worker_ring, worker_encoder
+        worker_ring, worker_encoder = self.ring, self.encoder
+        future = Future()
+        try:
+            future.set_result(prepare_job(start, count, options))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)  # Finish queued segments so none are lost
+            self.executor = None
@@ -0,0 +1,185 @@
+import logging
+import threading
+
+from audio_preprocess import split_segments
+
+log = logging.getLogger(__name__)
+
+
+class SegmentQueue:
+    """Speculation, coalescing and spooling rules shared by TranscriptionWorker and AsyncPipeline.
+
+    Items on transcribe_queue are (segment_id, utterance); segment_id is None
+    for a final segment and the AudioWorker's id for a speculative one. The
+    runtime calls init_segment_queue() and provides transcribe_queue (a
+    queue.Queue or asyncio.Queue), backend, target_lang and the
+    partial_text_ready signal; it only decides how requests are run and how
+    text is emitted.
+    """
+
+    def init_segment_queue(self):
+        # Speculative segments still in play: id -> {"confirmed", "result", "failed", "task"}
+        self.speculative = {}
+        self.speculative_lock = threading.Lock()
+        # Coalescing: short queued segments are sent as one request
+        self.coalesce_enabled = True
+        self.COALESCE_MAX_SEGMENT = 2.0  # seconds; longer segments go alone
+        self.COALESCE_MAX_TOTAL = 20.0  # seconds of audio per merged request
+        self.COALESCE_GAP = 0.3  # seconds of silence between merged segments
+        self.held_item = None  # Item taken off the queue that didn't fit a batch
+        self.requests_saved = 0
+        self.spool = None  # OfflineSpool for segments and texts that failed
+
+    # Speculation
+
+    def add_speculative(self, segment_id):
+        with self.speculative_lock:
+            self.speculative[segment_id] = {"confirmed": False, "result": None, "failed": None, "task": None}
+
+    def take_confirmed(self, segment_id):
+        """Mark a speculative segment final; returns its transcript if it is ready to emit"""
+        with self.speculative_lock:
+            state = self.speculative.get(segment_id)
+            if state is None:
+                return None
+            if state["failed"] is not None:
+                # The request failed; now that the segment is final, keep it for later
+                del self.speculative[segment_id]
+                self.spool_segment(state["failed"])
+                return None
+            if state["result"] is None:
+                # Still in flight; emitted as final when it arrives
+                state["confirmed"] = True
+                return None
+            del self.speculative[segment_id]
+            return state["result"]
+
+    def drop_speculative(self, segment_id):
+        """Forget a cancelled segment: queued requests are skipped, results discarded"""
+        with self.speculative_lock:
+            return self.speculative.pop(segment_id, None)
+
+    def speculative_result(self, segment_id, utterance):
+        """True if a speculative transcript should be emitted now as final.
+
+        Until the segment is confirmed it is kept and shown as provisional
+        text; a cancelled segment's result is discarded.
+        """
+        with self.speculative_lock:
+            state = self.speculative.get(segment_id)
+            if state is None:
+                log.debug("Discarding cancelled speculative segment %d", segment_id)
+                return False
+            if state["confirmed"]:
+                del self.speculative[segment_id]
+                return True
+            state["result"] = utterance
+            state["task"] = None
+        if utterance.text.strip():
+            self.partial_text_ready.emit(utterance.text)
+        return False
+
+    # Coalescing
+
+    def is_short(self, item):
+        time_map = item[1].time_map
+        return time_map is not None and time_map.duration <= self.COALESCE_MAX_SEGMENT
+
+    def is_cancelled(self, item):
+        with self.speculative_lock:
+            return item[0] is not None and item[0] not in self.speculative
+
+    def collect_batch(self, first):
+        """Take further short segments that are already queued behind `first`"""
+        batch = [first]
+        if not self.coalesce_enabled or not self.is_short(first):
+            return batch
+        total = first[1].time_map.duration
+        while not self.transcribe_queue.empty():
+            item = self.transcribe_queue.get_nowait()
+            if self.is_cancelled(item):
+                continue
+            duration = item[1].time_map.duration if item[1].time_map else 0
+            if not self.is_short(item) or total + duration > self.COALESCE_MAX_TOTAL:
+                self.held_item = item
+                break
+            batch.append(item)
+            total += duration + self.COALESCE_GAP
+        return batch
+
+    def uncached_if_speculative(self, batch):
+        # Speculative audio is usually superseded, so it isn't worth a cache entry
+        if any(segment_id is not None for segment_id, _ in batch):
+            return self.backend.uncached()
+        return self.backend
+
+    def split_coalesced(self, batch, offsets, transcription):
+        """Give each utterance of a merged request its share of the transcript"""
+        self.requests_saved += len(batch) - 1
+        parts = split_segments(transcription["segments"], offsets)
+        if not transcription["segments"]:
+            # No timestamps to split on; attach all text to the first segment
+            parts = [(transcription["text"], [])] + [("", [])] * (len(batch) - 1)
+        for (_, utterance), (text, segments) in zip(batch, parts):
+            utterance.set_text(text, segments)
+
+    # Spooling
+
+    def spool_segment(self, utterance):
+        if self.spool is None:
+            return
+        self.spool.spool_audio(utterance.audio, utterance.meta())
+        log.info("Segment spooled for retry")
+
+    def spool_text(self, utterance):
+        if self.spool is None:
+            return
+        self.spool.spool_text(utterance.text, dict(utterance.meta(), target_lang=self.target_lang))
+        log.info("Text spooled for retry")
+
+    def segment_failed(self, segment_id, utterance):
+        """Spool a segment whose request failed, unless it may still be cancelled"""
+        if segment_id is not None:
+            with self.speculative_lock:
+                state = self.speculative.get(segment_id)
+                if state is None:
+                    return  # Cancelled: the extended segment replaces it
+                if not state["confirmed"]:
+                    state["failed"] = utterance
+                    return
+                del self.speculative[segment_id]
+        self.spool_segment(utterance)
+
+    def text_failed(self, segment_id, utterance):
+        """Spool a transcript that could not be emitted before a stop"""
+        if segment_id is not None:
+            with self.speculative_lock:
+                state = self.speculative.get(segment_id)
+                if state is None:
+                    return
+                if not state["confirmed"]:
+                    # Emitted on confirm if the pause turns out to end the segment
+                    state["result"] = utterance
+                    state["task"] = None
+                    return
+                del self.speculative[segment_id]
+        if utterance.text.strip():
+            self.spool_text(utterance)
+
+    def spool_queued(self):
+        """Keep every queued segment and unfinished speculation on disk before exit"""
+        items = [self.held_item] if self.held_item is not None else []
+        self.held_item = None
+        while not self.transcribe_queue.empty():
+            items.append(self.transcribe_queue.get_nowait())
+        with self.speculative_lock:
+            for segment_id, utterance in items:
+                # A speculative segment still queued was never cancelled, so keep it
+                if segment_id is None or self.speculative.pop(segment_id, None) is not None:
+                    self.spool_segment(utterance)
+            for state in self.speculative.values():
+                if state["failed"] is not None:
+                    self.spool_segment(state["failed"])
+                elif state["result"] is not None and state["result"].text.strip():
+                    self.spool_text(state["result"])
+            self.speculative.clear()
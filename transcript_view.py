@@ -0,0 +1,327 @@
+import os
+import json
+import time
+
+from PyQt6.QtWidgets import QListView, QStyledItemDelegate, QStyle, QAbstractItemView
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QRect, QSize
+from PyQt6.QtGui import QColor, QFont
+
+DEFAULT_SCROLLBACK_DIR = os.path.join(os.path.expanduser("~"), ".cache", "listen-write-translate", "scrollback")
+
+SourceRole = Qt.ItemDataRole.DisplayRole
+TranslationRole = Qt.ItemDataRole.UserRole + 1
+ProvisionalRole = Qt.ItemDataRole.UserRole + 2
+
+
+class TranscriptModel(QAbstractListModel):
+    """Paired source/translation rows with a bounded in-memory scrollback.
+
+    Rows are keyed by utterance seq. When more than max_rows rows are
+    loaded, the oldest are written to a JSONL page file and dropped from
+    memory. Scrolling back to the top pages them in again, and once twice
+    max_rows are loaded the newest are dropped from the bottom; rows that
+    were never written then wait in `tail`, outside the model, still taking
+    translations, until scrolling down brings them back. Loaded rows are
+    always page_file[first_loaded:last_loaded], followed by the rows never
+    written while last_loaded is None. The page file is deleted on close.
+    """
+
+    def __init__(self, max_rows=1000, page_dir=None, parent=None):
+        super().__init__(parent)
+        self.rows = []  # [source, translation, provisional, timestamp, seq]
+        self.tail = []  # Newest rows, kept out of the model while older ones are shown
+        self.max_rows = max_rows
+        page_dir = page_dir or os.getenv("SCROLLBACK_DIR", DEFAULT_SCROLLBACK_DIR)
+        os.makedirs(page_dir, exist_ok=True)
+        self.page_path = os.path.join(page_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.jsonl")
+        self.page_file = None
+        self.offsets = []  # File offset of each paged-out row
+        self.first_loaded = 0  # Index in the page file of the first loaded row
+        self.last_loaded = None  # Index in the page file after the last loaded row, None if the newest are loaded
+        self.follow_tail = True  # Only trim while the user is watching live text
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        if role == SourceRole:
+            return row[0]
+        if role == TranslationRole:
+            return row[1]
+        if role == ProvisionalRole:
+            return row[2]
+        return None
+
+    def append_row(self, source, translation="", provisional=False, seq=None):
+        row = [source, translation, provisional, time.time(), seq]
+        if self.last_loaded is not None:
+            self.tail.append(row)
+            if len(self.tail) > self.max_rows:
+                self.write_row(self.tail.pop(0))
+            return
+        position = len(self.rows)
+        self.beginInsertRows(QModelIndex(), position, position)
+        self.rows.append(row)
+        self.endInsertRows()
+        self.trim()
+
+    def update_row(self, row, position, source=None, translation=None, provisional=None, seq=None):
+        """Change a row; position is None for rows waiting in the tail"""
+        if source is not None:
+            row[0] = source
+        if translation is not None:
+            row[1] = translation
+        if provisional is not None:
+            row[2] = provisional
+        if seq is not None:
+            row[4] = seq
+        if position is not None:
+            index = self.index(position)
+            self.dataChanged.emit(index, index)
+
+    def newest(self):
+        """The newest row and its position in the model"""
+        if self.last_loaded is not None:
+            return (self.tail[-1], None) if self.tail else (None, None)
+        return (self.rows[-1], len(self.rows) - 1) if self.rows else (None, None)
+
+    def set_partial(self, text):
+        row, position = self.newest()
+        if row is not None and row[2]:
+            self.update_row(row, position, source=text)
+        else:
+            self.append_row(text, provisional=True)
+
+    def clear_partial(self):
+        row, position = self.newest()
+        if row is None or not row[2]:
+            return
+        if position is None:
+            self.tail.pop()
+            return
+        self.beginRemoveRows(QModelIndex(), position, position)
+        self.rows.pop()
+        self.endRemoveRows()
+
+    def set_final(self, seq, text):
+        row, position = self.newest()
+        if row is not None and row[2]:
+            self.update_row(row, position, source=text, provisional=False, seq=seq)
+        else:
+            self.append_row(text, seq=seq)
+
+    def set_translation(self, seq, source, translation):
+        """Attach a translation to the untranslated row of utterance `seq`.
+
+        The source text must match too: seqs restart each session, and spool
+        replays can carry one from an earlier session.
+        """
+        if self.last_loaded is not None:
+            candidates = [(row, None) for row in reversed(self.tail)]
+        else:
+            candidates = ((self.rows[position], position) for position in range(len(self.rows) - 1, -1, -1))
+        for row, position in candidates:
+            if row[4] == seq and row[0] == source and not row[1] and not row[2]:
+                self.update_row(row, position, translation=translation)
+                return
+        self.append_row(source, translation, seq=seq)
+
+    def trim(self):
+        excess = len(self.rows) - self.max_rows
+        # While the user reads older rows, allow up to twice the limit
+        if excess <= 0 or (not self.follow_tail and len(self.rows) < self.max_rows * 2):
+            return
+        self.drop_top(excess)
+
+    def drop_top(self, count):
+        for row in self.rows[:count]:
+            if self.first_loaded < len(self.offsets):
+                self.first_loaded += 1  # Already on disk from an earlier page-out
+            else:
+                self.write_row(row)
+                self.first_loaded = len(self.offsets)
+        self.beginRemoveRows(QModelIndex(), 0, count - 1)
+        del self.rows[:count]
+        self.endRemoveRows()
+
+    def drop_bottom(self, count):
+        if self.last_loaded is None:
+            # Rows never written leave the model but stay in memory
+            self.last_loaded = len(self.offsets)
+            written = self.last_loaded - self.first_loaded
+            unwritten = len(self.rows) - written
+            if unwritten:
+                self.beginRemoveRows(QModelIndex(), written, len(self.rows) - 1)
+                self.tail = self.rows[written:] + self.tail
+                del self.rows[written:]
+                self.endRemoveRows()
+            count = min(count - unwritten, written)
+        if count > 0:
+            self.beginRemoveRows(QModelIndex(), len(self.rows) - count, len(self.rows) - 1)
+            del self.rows[len(self.rows) - count:]
+            self.endRemoveRows()
+            self.last_loaded -= count
+
+    def write_row(self, row):
+        if self.page_file is None:
+            self.page_file = open(self.page_path, "a+b")
+        self.page_file.seek(0, os.SEEK_END)
+        self.offsets.append(self.page_file.tell())
+        line = json.dumps({"source": row[0], "translation": row[1], "time": row[3], "seq": row[4]},
+                          ensure_ascii=False)
+        self.page_file.write(line.encode("utf-8") + b"\n")
+        self.page_file.flush()
+
+    def read_rows(self, start, end):
+        self.page_file.seek(self.offsets[start])
+        rows = []
+        for _ in range(end - start):
+            entry = json.loads(self.page_file.readline())
+            rows.append([entry["source"], entry["translation"], False, entry["time"], entry.get("seq")])
+        return rows
+
+    def can_page_in(self):
+        return self.first_loaded > 0
+
+    def page_in(self, count):
+        """Load up to `count` older rows from the page file; returns how many were loaded"""
+        start = max(0, self.first_loaded - count)
+        if start == self.first_loaded:
+            return 0
+        rows = self.read_rows(start, self.first_loaded)
+        self.beginInsertRows(QModelIndex(), 0, len(rows) - 1)
+        self.rows[:0] = rows
+        self.endInsertRows()
+        self.first_loaded = start
+        excess = len(self.rows) - self.max_rows * 2
+        if excess > 0:
+            self.drop_bottom(excess)
+        return len(rows)
+
+    def can_page_down(self):
+        return self.last_loaded is not None
+
+    def page_down(self, count):
+        """Load up to `count` newer rows, and the tail once the page file is used up"""
+        end = min(self.last_loaded + count, len(self.offsets))
+        rows = self.read_rows(self.last_loaded, end) if end > self.last_loaded else []
+        self.last_loaded = end
+        if end == len(self.offsets):
+            rows += self.tail
+            self.tail = []
+            self.last_loaded = None
+        if rows:
+            position = len(self.rows)
+            self.beginInsertRows(QModelIndex(), position, position + len(rows) - 1)
+            self.rows += rows
+            self.endInsertRows()
+        excess = len(self.rows) - self.max_rows * 2
+        if excess > 0:
+            self.drop_top(excess)
+        return len(rows)
+
+    def close(self):
+        if self.page_file is not None:
+            self.page_file.close()
+            self.page_file = None
+        try:
+            os.remove(self.page_path)
+        except OSError:
+            pass
+
+
+class TranscriptDelegate(QStyledItemDelegate):
+    """Draws a row as source text and translation side by side"""
+    PADDING = 6
+
+    def __init__(self, view):
+        super().__init__(view)
+        self.view = view
+
+    def column_rects(self, rect):
+        half = rect.width() // 2
+        left = QRect(rect.left(), rect.top(), half, rect.height())
+        right = QRect(rect.left() + half, rect.top(), rect.width() - half, rect.height())
+        pad = self.PADDING
+        return left.adjusted(pad, pad // 2, -pad, -pad // 2), right.adjusted(pad, pad // 2, -pad, -pad // 2)
+
+    def text_height(self, metrics, width, text):
+        flags = Qt.TextFlag.TextWordWrap
+        return metrics.boundingRect(QRect(0, 0, max(width, 1), 100000), flags, text or " ").height()
+
+    def sizeHint(self, option, index):
+        width = self.view.viewport().width()
+        column_width = width // 2 - 2 * self.PADDING
+        metrics = option.fontMetrics
+        height = max(self.text_height(metrics, column_width, index.data(SourceRole)),
+                     self.text_height(metrics, column_width, index.data(TranslationRole)))
+        return QSize(width, height + self.PADDING)
+
+    def paint(self, painter, option, index):
+        painter.save()
+        if option.state & QStyle.StateFlag.State_Selected:
+            painter.fillRect(option.rect, option.palette.highlight())
+        source_rect, translation_rect = self.column_rects(option.rect)
+        provisional = index.data(ProvisionalRole)
+        font = QFont(option.font)
+        font.setItalic(bool(provisional))
+        painter.setFont(font)
+        painter.setPen(QColor("gray") if provisional else option.palette.text().color())
+        flags = Qt.TextFlag.TextWordWrap | Qt.AlignmentFlag.AlignTop
+        painter.drawText(source_rect, flags, index.data(SourceRole))
+        painter.setPen(option.palette.text().color())
+        painter.drawText(translation_rect, flags, index.data(TranslationRole) or "")
+        painter.restore()
+
+
+class TranscriptView(QListView):
+    """List view that lays rows out lazily, follows new text and pages in history at the top"""
+    PAGE_ROWS = 100
+
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        self.setModel(model)
+        self.setItemDelegate(TranscriptDelegate(self))
+        self.setLayoutMode(QListView.LayoutMode.Batched)
+        self.setBatchSize(50)
+        self.setResizeMode(QListView.ResizeMode.Adjust)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.at_bottom = True
+        self.paging = False
+        model.rowsAboutToBeInserted.connect(self.remember_position)
+        model.rowsInserted.connect(self.follow)
+        self.verticalScrollBar().valueChanged.connect(self.scrolled)
+
+    def remember_position(self, *args):
+        scrollbar = self.verticalScrollBar()
+        self.at_bottom = scrollbar.value() >= scrollbar.maximum() - 2
+
+    def follow(self, parent, first, last):
+        if self.at_bottom and first > 0 and not self.paging:
+            self.scrollToBottom()
+
+    def scrolled(self, value):
+        model = self.model()
+        scrollbar = self.verticalScrollBar()
+        model.follow_tail = value >= scrollbar.maximum() - 2
+        if value == scrollbar.minimum() and model.can_page_in() and scrollbar.maximum() > 0:
+            loaded = model.page_in(self.PAGE_ROWS)
+            if loaded:
+                # Keep the row the user was looking at in place
+                self.scrollTo(model.index(loaded), QAbstractItemView.ScrollHint.PositionAtTop)
+        elif value == scrollbar.maximum() and model.can_page_down() and scrollbar.maximum() > 0:
+            last_row = model.rowCount() - 1
+            first_loaded = model.first_loaded
+            self.paging = True
+            try:
+                model.page_down(self.PAGE_ROWS)
+            finally:
+                self.paging = False
+            # Rows dropped from the top were all on disk, so first_loaded counts them
+            last_row -= model.first_loaded - first_loaded
+            self.scrollTo(model.index(last_row), QAbstractItemView.ScrollHint.PositionAtBottom)
@@ -0,0 +1,323 @@
+import os
+import io
+import sys
+import time
+import wave
+import asyncio
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+from transcription_cache import TranscriptionCache, audio_key
+from wav_io import BufferReader
+
+try:
+    from faster_whisper import WhisperModel
+except ImportError:  # Local backend is optional
+    WhisperModel = None
+
+GROQ_MODEL = "whisper-large-v3-turbo"
+
+
+def normalize_response(transcription):
+    """Convert a verbose_json transcription into a plain dict.
+
+    Every backend returns the same shape so callers don't care where the
+    text came from: {"text", "language", "duration", "segments": [...]},
+    where each segment has at least "start", "end" and "text".
+    """
+    if hasattr(transcription, "model_dump"):
+        data = transcription.model_dump()
+    elif isinstance(transcription, dict):
+        data = dict(transcription)
+    else:
+        data = {"text": getattr(transcription, "text", "")}
+    segments = []
+    for segment in data.get("segments") or []:
+        if not isinstance(segment, dict):
+            segment = segment.model_dump() if hasattr(segment, "model_dump") else vars(segment)
+        segments.append(segment)
+    data["segments"] = segments
+    data["text"] = data.get("text") or ""
+    return data
+
+
+def wav_duration(wav_bytes):
+    with wave.open(io.BytesIO(wav_bytes), 'rb') as wav:
+        return wav.getnframes() / wav.getframerate()
+
+
+class TranscriptionBackend:
+    """Interface shared by all speech-to-text backends"""
+    name = "base"
+
+    def transcribe(self, wav_bytes, **params):
+        """Transcribe one WAV file given as bytes and return a normalized dict"""
+        raise NotImplementedError
+
+    async def atranscribe(self, wav_bytes, **params):
+        """Awaitable transcribe; backends without an async client run it in a thread"""
+        return await asyncio.to_thread(self.transcribe, wav_bytes, **params)
+
+    def transcribe_many(self, wav_list, **params):
+        return [self.transcribe(wav_bytes, **params) for wav_bytes in wav_list]
+
+    def uncached(self):
+        """This backend without a result cache, for audio that won't be sent again"""
+        return self
+
+    def close(self):
+        pass
+
+    async def aclose(self):
+        """Close clients created by atranscribe, on the loop that created them"""
+
+
+class CachingBackend(TranscriptionBackend):
+    """Serve repeated audio from a TranscriptionCache instead of the wrapped backend.
+
+    Interim snapshots and speculative segments go through uncached(): they
+    never recur and would only push useful entries out.
+    """
+
+    def __init__(self, backend, cache):
+        self.backend = backend
+        self.cache = cache
+        self.name = backend.name
+        self.model = getattr(backend, "model", None) or getattr(backend, "model_size", None)
+
+    def transcribe(self, wav_bytes, **params):
+        key = audio_key(wav_bytes, self.name, self.model, params)
+        result = self.cache.get(key)
+        if result is None:
+            result = self.backend.transcribe(wav_bytes, **params)
+            self.cache.put(key, result)
+        return result
+
+    async def atranscribe(self, wav_bytes, **params):
+        key = audio_key(wav_bytes, self.name, self.model, params)
+        result = await asyncio.to_thread(self.cache.get, key)
+        if result is None:
+            result = await self.backend.atranscribe(wav_bytes, **params)
+            await asyncio.to_thread(self.cache.put, key, result)
+        return result
+
+    def uncached(self):
+        return self.backend
+
+    def close(self):
+        self.backend.close()
+
+    async def aclose(self):
+        await self.backend.aclose()
+
+
+class GroqBackend(TranscriptionBackend):
+    """Hosted Whisper through the Groq API"""
+    name = "groq"
+
+    def __init__(self, client=None, model=GROQ_MODEL):
+        if client is None:
+            from groq import Groq
+            client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+        self.client = client
+        self.model = model
+        self.async_client = None  # AsyncGroq, created on first use by the event loop that uses it
+
+    def transcribe(self, wav_bytes, **params):
+        metrics.bytes_uploaded.inc("groq", amount=memoryview(wav_bytes).nbytes)
+        try:
+            transcription = self.client.audio.transcriptions.create(
+                file=("audio.wav", BufferReader(wav_bytes)),  # Streamed from the buffer, not copied
+                model=self.model,
+                response_format="verbose_json",
+                **params
+            )
+        except Exception as e:
+            metrics.api_error("groq", e)
+            raise
+        return normalize_response(transcription)
+
+    async def atranscribe(self, wav_bytes, **params):
+        if self.async_client is None:
+            from groq import AsyncGroq
+            self.async_client = AsyncGroq(api_key=self.client.api_key, base_url=self.client.base_url)
+        metrics.bytes_uploaded.inc("groq", amount=memoryview(wav_bytes).nbytes)
+        try:
+            transcription = await self.async_client.audio.transcriptions.create(
+                file=("audio.wav", BufferReader(wav_bytes)),
+                model=self.model,
+                response_format="verbose_json",
+                **params
+            )
+        except Exception as e:
+            metrics.api_error("groq", e)
+            raise
+        return normalize_response(transcription)
+
+    async def aclose(self):
+        if self.async_client is not None:
+            await self.async_client.close()
+            self.async_client = None
+
+
+# Loaded once per worker process by the pool initializer and kept warm
+worker_model = None
+
+
+def load_worker_model(model_size, compute_type, cpu_threads):
+    global worker_model
+    worker_model = WhisperModel(model_size, device="cpu", compute_type=compute_type,
+                                cpu_threads=cpu_threads)
+
+
+def transcribe_in_worker(wav_bytes, params):
+    segments, info = worker_model.transcribe(io.BytesIO(wav_bytes), **params)
+    result_segments = []
+    for segment in segments:
+        result_segments.append({
+            "id": segment.id,
+            "start": segment.start,
+            "end": segment.end,
+            "text": segment.text,
+            "avg_logprob": segment.avg_logprob,
+            "no_speech_prob": segment.no_speech_prob,
+        })
+    return {
+        "text": "".join(segment["text"] for segment in result_segments).strip(),
+        "language": info.language,
+        "duration": info.duration,
+        "segments": result_segments,
+    }
+
+
+def silent_wav(seconds=1.0, rate=16000):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(b"\x00\x00" * int(seconds * rate))
+    return buffer.getvalue()
+
+
+class LocalWhisperBackend(TranscriptionBackend):
+    """Offline CPU Whisper using faster-whisper (CTranslate2, int8).
+
+    Each worker process loads the model once and keeps it in memory, so
+    segments submitted together are spread across cores.
+    """
+    name = "local"
+
+    def __init__(self, model_size="small", compute_type="int8", workers=None, beam_size=1):
+        if WhisperModel is None:
+            raise RuntimeError("Local backend needs faster-whisper: pip install faster-whisper")
+        cores = os.cpu_count() or 1
+        self.workers = workers or max(1, min(4, cores // 2))
+        self.model_size = model_size
+        self.beam_size = beam_size
+        cpu_threads = max(1, cores // self.workers)
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=load_worker_model,
+            initargs=(model_size, compute_type, cpu_threads)
+        )
+        self.warm_up()
+
+    def warm_up(self):
+        """Start every worker now so the first real segment doesn't pay for loading"""
+        params = {"beam_size": self.beam_size}
+        futures = [self.pool.submit(transcribe_in_worker, silent_wav(), params)
+                   for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def params(self, params):
+        merged = {"beam_size": self.beam_size}
+        merged.update(params)
+        return merged
+
+    def transcribe(self, wav_bytes, **params):
+        # Memoryviews from WavEncoder can't be pickled to the worker process
+        return self.pool.submit(transcribe_in_worker, bytes(wav_bytes), self.params(params)).result()
+
+    async def atranscribe(self, wav_bytes, **params):
+        future = self.pool.submit(transcribe_in_worker, bytes(wav_bytes), self.params(params))
+        return await asyncio.wrap_future(future)
+
+    def transcribe_many(self, wav_list, **params):
+        params = self.params(params)
+        futures = [self.pool.submit(transcribe_in_worker, bytes(wav_bytes), params) for wav_bytes in wav_list]
+        return [future.result() for future in futures]
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+def create_backend(name=None, client=None, cache=None):
+    """Build the backend selected by TRANSCRIPTION_BACKEND (groq or local).
+
+    Results are cached on disk unless cache=False or TRANSCRIPTION_CACHE=0.
+    """
+    name = name or os.getenv("TRANSCRIPTION_BACKEND", "groq")
+    if name == "groq":
+        backend = GroqBackend(client=client, model=os.getenv("GROQ_MODEL", GROQ_MODEL))
+    elif name == "local":
+        workers = os.getenv("LOCAL_WHISPER_WORKERS")
+        backend = LocalWhisperBackend(
+            model_size=os.getenv("LOCAL_WHISPER_MODEL", "small"),
+            compute_type=os.getenv("LOCAL_WHISPER_COMPUTE", "int8"),
+            workers=int(workers) if workers else None
+        )
+    else:
+        raise ValueError(f"Unknown transcription backend: {name}")
+
+    if cache is None:
+        cache = os.getenv("TRANSCRIPTION_CACHE", "1") != "0"
+    if cache:
+        backend = CachingBackend(backend, TranscriptionCache())
+    return backend
+
+
+def benchmark(backend, wav_files):
+    """Transcribe each file and report the real-time factor (processing / audio time)"""
+    total_audio = 0
+    total_elapsed = 0
+    for filename in wav_files:
+        with open(filename, "rb") as file:
+            wav_bytes = file.read()
+        duration = wav_duration(wav_bytes)
+        start = time.perf_counter()
+        backend.transcribe(wav_bytes)
+        elapsed = time.perf_counter() - start
+        total_audio += duration
+        total_elapsed += elapsed
+        print(f"[{backend.name}] {os.path.basename(filename)}: {duration:.1f}s audio "
+              f"in {elapsed:.2f}s (RTF {elapsed / duration:.3f})")
+    if total_audio:
+        print(f"[{backend.name}] total: {total_audio:.1f}s audio in {total_elapsed:.2f}s "
+              f"(RTF {total_elapsed / total_audio:.3f})")
+    return total_elapsed / total_audio if total_audio else None
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Compare transcription backends on WAV files")
+    parser.add_argument("files", nargs="+", help="WAV files to transcribe")
+    parser.add_argument("--backends", nargs="+", default=["groq", "local"],
+                        choices=["groq", "local"])
+    args = parser.parse_args()
+
+    for backend_name in args.backends:
+        try:
+            backend = create_backend(backend_name, cache=False)
+        except Exception as e:
+            print(f"[{backend_name}] unavailable: {e}")
+            continue
+        try:
+            benchmark(backend, args.files)
+        finally:
+            backend.close()
+    sys.exit(0)
@@ -0,0 +1,108 @@
+import os
+import json
+import hashlib
+import threading
+
+from wav_io import parse_wav
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "listen-write-translate", "transcriptions")
+
+
+def audio_key(wav_bytes, backend, model, params=None):
+    """Content hash of the PCM frames plus everything that affects the result.
+
+    "Normalized" here means the header is stripped: only the sample format
+    (channels, sample width, rate) and the raw frames are hashed, so the same
+    audio saved with a different header or metadata chunks still hits the
+    same entry. The audio is not resampled or downmixed first; that would
+    cost more than the hash, and a different rate or channel count can
+    change what the API returns.
+    """
+    digest = hashlib.sha256()
+    view = memoryview(wav_bytes).cast("B")
+    _, channels, rate, bits, offset, size = parse_wav(view)
+    digest.update(repr((channels, (bits + 7) // 8, rate)).encode())
+    digest.update(view[offset:offset + size])  # Hashed in place, no copy of the frames
+    digest.update(json.dumps([backend, model, params or {}], sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class TranscriptionCache:
+    """Content-addressed on-disk cache of verbose_json transcription results.
+
+    Entries are JSON files named by key. Reading an entry refreshes its
+    mtime, and the least recently used entries are removed once the cache
+    grows past max_bytes. The GUI, groq_demo.py and the batch tools share
+    the same directory.
+    """
+
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = directory or os.getenv("TRANSCRIPTION_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes or int(os.getenv("TRANSCRIPTION_CACHE_MB", "500")) * 1024 * 1024
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self.total_bytes = sum(os.path.getsize(path) for path in self.entries())
+
+    def entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"):
+                    yield os.path.join(root, name)
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                value = json.load(file)
+            os.utime(path)  # Mark as recently used
+        except (OSError, ValueError):
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return value
+
+    def put(self, key, value):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(data)
+        with self.lock:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self.total_bytes += len(data) - old_size
+            if self.total_bytes > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache is 90% of max_bytes"""
+        target = self.max_bytes * 0.9
+        entries = []
+        for path in self.entries():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        self.total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self.total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.total_bytes -= size
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
@@ -0,0 +1,276 @@
+import os
+import time
+import asyncio
+import logging
+import queue
+import threading
+import importlib.util
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import requests
+
+import metrics
+
+try:
+    import httpx
+except ImportError:  # Only needed for the async pipeline; falls back to a thread
+    httpx = None
+
+# Local models per DeepLX target language (source is English)
+LOCAL_MODELS = {
+    "ZH": "Helsinki-NLP/opus-mt-en-zh",
+    "JA": "Helsinki-NLP/opus-mt-en-jap",
+    "DE": "Helsinki-NLP/opus-mt-en-de",
+    "FR": "Helsinki-NLP/opus-mt-en-fr",
+}
+
+log = logging.getLogger(__name__)
+
+
+class TranslationError(Exception):
+    pass
+
+
+class TranslationBackend:
+    """Interface shared by all translation backends"""
+    name = "base"
+
+    def translate(self, text, target_lang="ZH"):
+        raise NotImplementedError
+
+    async def atranslate(self, text, target_lang="ZH"):
+        """Awaitable translate; backends without an async client run it in a thread"""
+        return await asyncio.to_thread(self.translate, text, target_lang)
+
+    def close(self):
+        pass
+
+    async def aclose(self):
+        """Close clients created by atranslate, on the loop that created them"""
+
+
+class DeepLXBackend(TranslationBackend):
+    name = "deeplx"
+
+    def __init__(self, api_key, timeout=5):
+        self.url = f"https://api.deeplx.org/{api_key}/translate"
+        self.timeout = timeout
+        self.async_client = None  # httpx.AsyncClient, created on first use by its event loop
+
+    def translate(self, text, target_lang="ZH"):
+        try:
+            response = requests.post(
+                self.url,
+                json={"text": text, "target_lang": target_lang},
+                headers={"Content-Type": "application/json"},
+                timeout=self.timeout
+            )
+        except Exception as e:
+            metrics.api_error(self.name, e)
+            raise
+        return self.parse(response)
+
+    def parse(self, response):
+        if response.status_code != 200:
+            metrics.api_error(self.name, response.status_code)
+            raise TranslationError(f"{response.status_code}")
+        return response.json()['data']
+
+    async def atranslate(self, text, target_lang="ZH"):
+        if httpx is None:
+            return await super().atranslate(text, target_lang)
+        if self.async_client is None:
+            self.async_client = httpx.AsyncClient(timeout=self.timeout)
+        try:
+            response = await self.async_client.post(self.url, json={"text": text, "target_lang": target_lang})
+        except Exception as e:
+            metrics.api_error(self.name, e)
+            raise
+        return self.parse(response)
+
+    async def aclose(self):
+        if self.async_client is not None:
+            await self.async_client.aclose()
+            self.async_client = None
+
+
+# Loaded once in the worker process and kept in memory
+worker_tokenizer = None
+worker_model = None
+
+
+def load_translation_model(model_name):
+    global worker_tokenizer, worker_model
+    from transformers import MarianMTModel, MarianTokenizer
+    worker_tokenizer = MarianTokenizer.from_pretrained(model_name)
+    worker_model = MarianMTModel.from_pretrained(model_name)
+    worker_model.eval()
+
+
+def translate_in_worker(texts):
+    import torch
+    batch = worker_tokenizer(texts, return_tensors="pt", padding=True, truncation=True)
+    with torch.no_grad():
+        generated = worker_model.generate(**batch)
+    return worker_tokenizer.batch_decode(generated, skip_special_tokens=True)
+
+
+class LocalMarianBackend(TranslationBackend):
+    """Offline CPU translation with a MarianMT model.
+
+    The model lives in a single worker process. Requests arriving within
+    batch_window seconds of each other are translated in one batch. Batches
+    only form when callers translate concurrently, as the async pipeline's
+    translate stage and spool replay do; the QThread runtime translates one
+    utterance at a time, so there every batch holds a single text.
+    """
+    name = "local"
+
+    def __init__(self, target_lang="ZH", model_name=None, max_batch=16, batch_window=0.05):
+        if importlib.util.find_spec("transformers") is None:
+            raise RuntimeError("Local translation needs transformers: pip install transformers sentencepiece torch")
+        self.model_name = model_name or LOCAL_MODELS[target_lang]
+        self.target_lang = target_lang
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.pool = ProcessPoolExecutor(max_workers=1, initializer=load_translation_model,
+                                        initargs=(self.model_name,))
+        # Warm up so the first caption doesn't wait for the model to load
+        self.pool.submit(translate_in_worker, ["Hello"]).result()
+        self.requests = queue.Queue()
+        self.batcher = threading.Thread(target=self.batch_loop, daemon=True)
+        self.batcher.start()
+
+    def submit(self, text, target_lang):
+        if target_lang != self.target_lang:
+            raise TranslationError(f"Local model {self.model_name} does not translate to {target_lang}")
+        future = Future()
+        self.requests.put((text, future))
+        return future
+
+    def translate(self, text, target_lang="ZH"):
+        return self.submit(text, target_lang).result()
+
+    async def atranslate(self, text, target_lang="ZH"):
+        return await asyncio.wrap_future(self.submit(text, target_lang))
+
+    def batch_loop(self):
+        while True:
+            item = self.requests.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.requests.put(None)  # Finish this batch, then exit
+                    break
+                batch.append(item)
+
+            try:
+                results = self.pool.submit(translate_in_worker, [text for text, _ in batch]).result()
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def close(self):
+        self.requests.put(None)
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class FallbackTranslator(TranslationBackend):
+    """Route to the primary backend and fall back to a local one.
+
+    The fallback is used when the primary fails, and for cooldown seconds
+    after the primary was slower than latency_budget, after which the
+    primary is tried again.
+    """
+    name = "fallback"
+
+    def __init__(self, primary, fallback, latency_budget=1.5, cooldown=30):
+        self.primary = primary
+        self.fallback = fallback
+        self.latency_budget = latency_budget
+        self.cooldown = cooldown
+        self.skip_primary_until = 0
+        self.last_route = None
+
+    def translate(self, text, target_lang="ZH"):
+        if time.monotonic() < self.skip_primary_until:
+            self.last_route = self.fallback.name
+            return self.fallback.translate(text, target_lang)
+
+        start = time.monotonic()
+        try:
+            result = self.primary.translate(text, target_lang)
+        except Exception as e:
+            self.primary_failed(e)
+            return self.fallback.translate(text, target_lang)
+        self.primary_done(start)
+        return result
+
+    async def atranslate(self, text, target_lang="ZH"):
+        if time.monotonic() < self.skip_primary_until:
+            self.last_route = self.fallback.name
+            return await self.fallback.atranslate(text, target_lang)
+
+        start = time.monotonic()
+        try:
+            result = await self.primary.atranslate(text, target_lang)
+        except Exception as e:
+            self.primary_failed(e)
+            return await self.fallback.atranslate(text, target_lang)
+        self.primary_done(start)
+        return result
+
+    def primary_failed(self, error):
+        log.info("%s failed (%s), using %s", self.primary.name, error, self.fallback.name)
+        self.skip_primary_until = time.monotonic() + self.cooldown
+        self.last_route = self.fallback.name
+
+    def primary_done(self, start):
+        elapsed = time.monotonic() - start
+        if elapsed > self.latency_budget:
+            log.info("%s took %.2fs, routing to %s for %ss",
+                     self.primary.name, elapsed, self.fallback.name, self.cooldown)
+            self.skip_primary_until = time.monotonic() + self.cooldown
+        self.last_route = self.primary.name
+
+    def close(self):
+        self.primary.close()
+        self.fallback.close()
+
+    async def aclose(self):
+        await self.primary.aclose()
+        await self.fallback.aclose()
+
+
+def create_translator(name=None, target_lang="ZH"):
+    """Build the translator selected by TRANSLATION_BACKEND (deeplx, local or auto)"""
+    name = name or os.getenv("TRANSLATION_BACKEND", "deeplx")
+    latency_budget = float(os.getenv("TRANSLATION_LATENCY_BUDGET", "1.5"))
+    if name == "local":
+        return LocalMarianBackend(target_lang, os.getenv("LOCAL_TRANSLATION_MODEL"))
+
+    # Cap the request so a hung DeepLX can't hold the caller much past the budget
+    deeplx = DeepLXBackend(os.getenv("deeplx_api_key"), timeout=max(latency_budget * 2, 1))
+    if name == "deeplx":
+        return deeplx
+    if name == "auto":
+        try:
+            local = LocalMarianBackend(target_lang, os.getenv("LOCAL_TRANSLATION_MODEL"))
+        except Exception as e:
+            log.warning("Local translation unavailable, using DeepLX only: %s", e)
+            return deeplx
+        return FallbackTranslator(deeplx, local, latency_budget=latency_budget)
+    raise ValueError(f"Unknown translation backend: {name}")
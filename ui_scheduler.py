@@ -0,0 +1,66 @@
+import time
+import logging
+
+from PyQt6.QtCore import QObject, QTimer
+
+log = logging.getLogger(__name__)
+
+
+class UiUpdateScheduler(QObject):
+    """Collects UI updates and applies them at most max_fps times a second.
+
+    Updates are a callback plus arguments. An update posted with a key
+    replaces the pending one with the same key (sound level, interim text)
+    and moves to the end of the queue; keyless updates are applied in
+    order. The flush timer also measures how late it fires, i.e. how long
+    the event loop was busy with something else.
+    """
+
+    def __init__(self, max_fps=30, parent=None):
+        super().__init__(parent)
+        self.interval = 1.0 / max_fps
+        self.pending = []  # [key, callback, args]
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(int(self.interval * 1000))
+        self.timer.timeout.connect(self.flush)
+        self.scheduled_at = None
+        self.flushes = 0
+        self.applied = 0
+        self.coalesced = 0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+
+    def post(self, callback, *args, key=None):
+        if key is not None:
+            for item in self.pending:
+                if item[0] == key:
+                    self.pending.remove(item)
+                    self.coalesced += 1
+                    break
+        self.pending.append([key, callback, args])
+        if not self.timer.isActive():
+            self.scheduled_at = time.perf_counter()
+            self.timer.start()
+
+    def flush(self):
+        if self.scheduled_at is not None:
+            lag = max(0.0, time.perf_counter() - self.scheduled_at - self.interval)
+            self.lag_total += lag
+            self.lag_max = max(self.lag_max, lag)
+            self.scheduled_at = None
+        pending, self.pending = self.pending, []
+        for _, callback, args in pending:
+            try:
+                callback(*args)
+            except Exception as e:
+                log.exception("UI update error: %s", e)
+        self.flushes += 1
+        self.applied += len(pending)
+
+    def stall_summary(self):
+        if not self.flushes:
+            return "UI updates: none"
+        return (f"UI updates: {self.applied} applied in {self.flushes} frames, {self.coalesced} coalesced, "
+                f"event loop lag avg {self.lag_total / self.flushes * 1000:.1f} ms, "
+                f"max {self.lag_max * 1000:.1f} ms")
@@ -0,0 +1,103 @@
+import os
+import sys
+import time
+import logging
+import threading
+import traceback
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+log = logging.getLogger(__name__)
+
+
+class EventLoopWatchdog(QObject):
+    """Detects stalls of the Qt main thread.
+
+    A heartbeat timer runs on the main thread every `interval` seconds. A
+    monitor thread notices when a heartbeat is overdue by more than
+    `threshold` and samples the main thread's stack while it is still stuck;
+    when the heartbeat finally fires the stall is recorded against the
+    innermost application frame of that sample.
+    """
+    stall_detected = pyqtSignal(float, str)  # seconds, location
+
+    def __init__(self, interval=0.05, threshold=0.25, parent=None):
+        super().__init__(parent)
+        self.interval = interval
+        self.threshold = threshold
+        self.main_ident = threading.main_thread().ident
+        self.timer = QTimer(self)
+        self.timer.setInterval(int(interval * 1000))
+        self.timer.timeout.connect(self.beat)
+        self.lock = threading.Lock()
+        self.last_beat = time.perf_counter()
+        self.sample = None  # (location, stack text) taken during the current stall
+        self.running = False
+        self.monitor_thread = None
+        self.stalls = 0
+        self.offenders = {}  # location -> [count, total seconds, worst seconds, stack text]
+
+    def start(self):
+        self.running = True
+        self.last_beat = time.perf_counter()
+        self.timer.start()
+        self.monitor_thread = threading.Thread(target=self.monitor, daemon=True)
+        self.monitor_thread.start()
+
+    def stop(self):
+        self.running = False
+        self.timer.stop()
+        if self.monitor_thread is not None:
+            self.monitor_thread.join()
+            self.monitor_thread = None
+
+    def beat(self):
+        now = time.perf_counter()
+        with self.lock:
+            late = now - self.last_beat - self.interval
+            sample, self.sample = self.sample, None
+            self.last_beat = now
+        if late > self.threshold:
+            self.record(late, sample)
+
+    def monitor(self):
+        while self.running:
+            time.sleep(self.interval)
+            with self.lock:
+                overdue = time.perf_counter() - self.last_beat - self.interval > self.threshold
+                if overdue and self.sample is None:
+                    self.sample = self.sample_stack()
+
+    def sample_stack(self):
+        frame = sys._current_frames().get(self.main_ident)
+        if frame is None:
+            return None
+        stack = traceback.extract_stack(frame)
+        # Blame the innermost frame in our own code, not the library it is blocked in
+        own = [entry for entry in stack if entry.filename.startswith(APP_DIR)]
+        entry = (own or stack)[-1]
+        location = f"{entry.name} ({os.path.basename(entry.filename)}:{entry.lineno})"
+        return location, "".join(traceback.format_list(stack[-8:]))
+
+    def record(self, seconds, sample):
+        location, stack = sample if sample else ("unknown", "")
+        self.stalls += 1
+        offender = self.offenders.setdefault(location, [0, 0.0, 0.0, stack])
+        offender[0] += 1
+        offender[1] += seconds
+        if seconds > offender[2]:
+            offender[2] = seconds
+            offender[3] = stack
+        log.info("Event loop stalled for %.0f ms in %s\n%s", seconds * 1000, location, stack,
+                 extra={"stall_ms": round(seconds * 1000), "location": location})
+        self.stall_detected.emit(seconds, location)
+
+    def summary(self, top=3):
+        if not self.stalls:
+            return "Event loop stalls: none"
+        worst = sorted(self.offenders.items(), key=lambda item: item[1][1], reverse=True)[:top]
+        parts = [f"{location} x{count}, worst {longest * 1000:.0f} ms"
+                 for location, (count, total, longest, _) in worst]
+        return f"Event loop stalls: {self.stalls}; worst offenders: " + "; ".join(parts)
@@ -0,0 +1,58 @@
+import time
+
+
+class Utterance:
+    """One utterance as it moves through transcription, translation, upload and the UI.
+
+    pcm refers to the processed samples (a view, never copied), audio is the
+    encoded WAV that is uploaded and time_map maps its timeline back to
+    capture time. timings maps a stage name to the time.time() at which that
+    stage finished. lost_ms is capture time missing inside the utterance.
+    """
+    __slots__ = ("seq", "capture_start", "capture_end", "pcm", "audio", "time_map",
+                 "text", "segments", "translation", "timings", "lost_ms")
+
+    def __init__(self, seq=None, capture_start=None, capture_end=None, pcm=None, audio=None,
+                 time_map=None, text=""):
+        self.seq = seq
+        self.capture_start = capture_start
+        self.capture_end = capture_end
+        self.pcm = pcm
+        self.audio = audio
+        self.time_map = time_map
+        self.text = text
+        self.segments = []
+        self.translation = None
+        self.timings = {}
+        self.lost_ms = 0
+
+    def mark(self, stage):
+        self.timings[stage] = time.time()
+
+    def set_text(self, text, segments):
+        """Store a transcription; segment times refer to the upload and are mapped to capture time"""
+        self.text = text
+        self.segments = self.time_map.map_segments(segments) if self.time_map else segments
+        self.mark("transcribed")
+
+    def latency(self, stage):
+        """Seconds from the end of speech until `stage` finished, or None"""
+        if stage not in self.timings or self.capture_end is None:
+            return None
+        return self.timings[stage] - self.capture_end
+
+    def meta(self):
+        """JSON-safe fields, enough to rebuild the record after spooling"""
+        return {"seq": self.seq, "capture_start": self.capture_start,
+                "capture_end": self.capture_end, "timings": self.timings, "lost_ms": self.lost_ms}
+
+    @classmethod
+    def from_meta(cls, meta, audio=None, text=""):
+        utterance = cls(meta.get("seq"), meta.get("capture_start"), meta.get("capture_end"),
+                        audio=audio, text=text)
+        utterance.timings = dict(meta.get("timings") or {})
+        utterance.lost_ms = meta.get("lost_ms", 0)
+        return utterance
+
+    def __repr__(self):
+        return f"Utterance({self.seq}, {self.capture_start}, {self.text!r})"
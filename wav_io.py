@@ -0,0 +1,259 @@
+import io
+import math
+import mmap
+import struct
+
+import numpy as np
+
+
+WAV_HEADER = struct.Struct("<4sI4s4sIHHIIHH4sI")
+
+
+def header_fields(n_frames, channels, rate, sample_width=2):
+    data_size = n_frames * channels * sample_width
+    return (
+        b"RIFF", 36 + data_size, b"WAVE",
+        b"fmt ", 16, 1, channels, rate,
+        rate * channels * sample_width, channels * sample_width, sample_width * 8,
+        b"data", data_size
+    )
+
+
+def wav_header(n_frames, channels, rate, sample_width=2):
+    """44-byte RIFF header for 16-bit PCM data"""
+    return WAV_HEADER.pack(*header_fields(n_frames, channels, rate, sample_width))
+
+
+def encode_pcm16(pcm, rate):
+    """Build a WAV file from an int16 array shaped (frames,) or (frames, channels)"""
+    channels = 1 if pcm.ndim == 1 else pcm.shape[1]
+    return wav_header(len(pcm), channels, rate) + pcm.astype(np.int16, copy=False).tobytes()
+
+
+class WavEncoder:
+    """Encode float audio in [-1, 1] as 16-bit WAV with a single output allocation.
+
+    The output buffer is allocated at its final size and the header written
+    first. Samples are then scaled, clipped and converted in cache-sized
+    chunks through a reused float32 scratch array, straight into the buffer,
+    so no full-size temporaries are created. encode() returns a memoryview
+    of the buffer; pass it on as is, wrapped in BufferReader where a file
+    object is needed.
+    """
+    CHUNK_SAMPLES = 16384
+
+    def __init__(self):
+        self.scratch = np.empty(self.CHUNK_SAMPLES, dtype=np.float32)
+
+    def encode(self, audio, rate):
+        channels = 1 if audio.ndim == 1 else audio.shape[1]
+        samples = audio.reshape(-1)
+        buffer = bytearray(WAV_HEADER.size + samples.size * 2)
+        WAV_HEADER.pack_into(buffer, 0, *header_fields(len(audio), channels, rate))
+        out = np.frombuffer(buffer, dtype=np.int16, offset=WAV_HEADER.size)
+        for start in range(0, samples.size, self.CHUNK_SAMPLES):
+            chunk = samples[start:start + self.CHUNK_SAMPLES]
+            scratch = self.scratch[:len(chunk)]
+            np.multiply(chunk, 32767, out=scratch)
+            np.clip(scratch, -32767, 32767, out=scratch)
+            out[start:start + len(chunk)] = scratch
+        return memoryview(buffer)
+
+
+class BufferReader(io.RawIOBase):
+    """Read-only, seekable file object over a bytes-like buffer.
+
+    read() returns memoryview slices of the buffer rather than copies, so
+    an HTTP client can stream an upload straight from the encoder's output.
+    """
+
+    def __init__(self, buffer):
+        super().__init__()
+        self.view = memoryview(buffer).cast("B")
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += len(self.view)
+        self.position = max(0, offset)
+        return self.position
+
+    def read(self, size=-1):
+        end = len(self.view) if size is None or size < 0 else min(len(self.view), self.position + size)
+        chunk = self.view[self.position:end]
+        self.position = max(self.position, end)
+        return chunk
+
+    def readinto(self, target):
+        chunk = self.read(len(target))
+        target[:len(chunk)] = chunk
+        return len(chunk)
+
+
+def parse_wav(buffer, name="WAV data"):
+    """Find the format and sample data of a WAV held in memory or a memory map.
+
+    Returns (audio_format, channels, rate, bits, data_offset, data_size)
+    without copying anything.
+    """
+    if buffer[:4] != b"RIFF" or buffer[8:12] != b"WAVE":
+        raise ValueError(f"{name} is not a WAV file")
+    position = 12
+    fmt = None
+    while position + 8 <= len(buffer):
+        chunk_id, chunk_size = struct.unpack_from("<4sI", buffer, position)
+        body = position + 8
+        if chunk_id == b"fmt ":
+            fmt = struct.unpack_from("<HHIIHH", buffer, body)
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise ValueError(f"{name}: data chunk before fmt chunk")
+            audio_format, channels, rate, _, _, bits = fmt
+            # Streaming writers may leave the size as 0 or 0xFFFFFFFF
+            available = len(buffer) - body
+            if chunk_size == 0 or chunk_size > available:
+                chunk_size = available
+            return audio_format, channels, rate, bits, body, chunk_size
+        position = body + chunk_size + (chunk_size & 1)
+    raise ValueError(f"{name}: no data chunk")
+
+
+class Resampler:
+    """Windowed-sinc polyphase resampler for a stream of mono blocks.
+
+    The rate ratio is reduced to up/down integers, so output sample n sits
+    exactly at input position n * down / up and no error accumulates across
+    blocks. Input that the filter still needs is carried over to the next
+    block; flush() pads the end with silence and returns the last samples.
+    Downsampling low-passes at the output Nyquist rate first.
+    """
+    CHUNK = 4096
+
+
+    def __init__(self, rate, out_rate=16000, half_width=16):
+        divisor = math.gcd(rate, out_rate)
+        self.up = out_rate // divisor
+        self.down = rate // divisor
+        cutoff = min(1.0, self.up / self.down) * (0.95 if self.down > self.up else 1.0)
+        self.half = int(math.ceil(half_width / cutoff))
+        taps = np.arange(2 * self.half)
+        # Row p holds the taps for an output that falls p/up of a sample after an input sample
+        distance = np.arange(self.up)[:, None] / self.up + self.half - 1 - taps[None, :]
+        window = 0.5 + 0.5 * np.cos(np.pi * np.clip(distance / self.half, -1, 1))
+        table = cutoff * np.sinc(cutoff * distance) * window
+        self.table = (table / table.sum(axis=1, keepdims=True)).astype(np.float32)
+        self.buffer = np.zeros(self.half, dtype=np.float32)  # Silence before the first sample
+        self.buffer_start = -self.half  # Input index of buffer[0]
+        self.n = 0  # Next output index
+        self.total_in = 0
+
+    def process(self, block, limit=None):
+        """Resample one block of float or int16 samples; returns float32"""
+        self.total_in += len(block)
+        self.buffer = np.concatenate([self.buffer, np.asarray(block, dtype=np.float32)])
+        end = self.buffer_start + len(self.buffer)
+        # Output n needs input up to (n * down) // up + half
+        last = ((end - self.half) * self.up - 1) // self.down
+        if limit is not None:
+            last = min(last, limit - 1)
+        count = max(0, last - self.n + 1)
+        positions = np.arange(self.n, self.n + count, dtype=np.int64) * self.down
+        first = positions // self.up - self.half + 1 - self.buffer_start
+        taps = np.arange(2 * self.half)
+        out = np.empty(count, dtype=np.float32)
+        # A few thousand outputs at a time keep the gathered windows small for long blocks
+        for begin in range(0, count, self.CHUNK):
+            end = begin + self.CHUNK
+            windows = self.buffer[first[begin:end, None] + taps[None, :]]
+            out[begin:end] = np.einsum("ij,ij->i", windows, self.table[positions[begin:end] % self.up])
+        self.n += count
+        keep = (self.n * self.down) // self.up - self.half + 1 - self.buffer_start
+        if keep > 0:
+            self.buffer = self.buffer[keep:]
+            self.buffer_start += keep
+        return out
+
+    def flush(self):
+        total_in = self.total_in
+        out = self.process(np.zeros(self.half + 1, dtype=np.float32), limit=total_in * self.up // self.down)
+        self.total_in = total_in
+        return out
+
+
+def downmix(pcm):
+    if pcm.ndim > 1:
+        return pcm.mean(axis=1, dtype=np.float32)
+    return pcm.astype(np.float32)
+
+
+def to_int16(samples):
+    return np.clip(np.round(samples), -32768, 32767).astype(np.int16)
+
+
+def to_mono_16k(pcm, rate):
+    """Downmix int16 PCM to mono and resample to 16 kHz (Whisper's native rate)"""
+    mono = downmix(pcm)
+    if rate == 16000:
+        return mono.astype(np.int16)
+    resampler = Resampler(rate)
+    return to_int16(np.concatenate([resampler.process(mono), resampler.flush()]))
+
+
+class WavReader:
+    """Memory-mapped reader for 16-bit PCM WAV files.
+
+    Samples are read straight from the mapped file, so only the pages
+    currently being processed need to be resident.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.parse_header()
+
+    def parse_header(self):
+        audio_format, self.channels, self.rate, bits, self.data_offset, data_size = parse_wav(self.map, self.path)
+        if audio_format not in (1, 0xFFFE) or bits != 16:
+            raise ValueError(f"{self.path}: only 16-bit PCM WAV is supported")
+        self.n_frames = data_size // (2 * self.channels)
+
+    @property
+    def duration(self):
+        return self.n_frames / self.rate
+
+    def frames(self, start, count):
+        """Zero-copy int16 view of frames [start, start + count)"""
+        count = max(0, min(count, self.n_frames - start))
+        data = np.frombuffer(self.map, dtype=np.int16, count=count * self.channels,
+                             offset=self.data_offset + start * 2 * self.channels)
+        return data.reshape(-1, self.channels)
+
+    def iter_blocks(self, block_seconds=0.1):
+        block_frames = int(self.rate * block_seconds)
+        for start in range(0, self.n_frames, block_frames):
+            yield self.frames(start, block_frames)
+
+    def close(self):
+        try:
+            self.map.close()
+        except BufferError:
+            pass  # A block view is still alive; the map is freed with it
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()